@@ -0,0 +1,177 @@
+# UniLib/media.py
+"""
+Serving MEDIA_ROOT (book covers, profile pictures).
+
+MediaMiddleware answers every GET/HEAD under MEDIA_URL before the session
+and auth middleware run, the way WhiteNoise does for static files. Every
+response gets an ETag, Last-Modified and Cache-Control, and conditional
+requests (If-None-Match, If-Modified-Since) get a 304 without opening the
+file. Files under MEDIA_IMMUTABLE_DIRS have content-addressed names (the
+cover renditions, see books/covers.py), so browsers keep them for a year
+without asking again. Everything else is cached for MEDIA_MAX_AGE seconds
+and then revalidated.
+
+MEDIA_SERVE_MODE picks who sends the bytes:
+
+- 'django': a FileResponse that honours single Range requests. WSGI
+  servers with wsgi.file_wrapper (gunicorn, uWSGI) send it with sendfile().
+- 'x-accel-redirect': nginx sends MEDIA_ACCEL_PREFIX + path, e.g.
+      location /protected-media/ { internal; alias /srv/unilib/media/; }
+- 'x-sendfile': Apache mod_xsendfile / lighttpd send the absolute path.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+MODES = ('django', 'x-accel-redirect', 'x-sendfile')
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class FileRange:
+    """
+    File limited to `length` bytes from `start`. read() stops at the end of
+    the range; fileno() lets sendfile() servers copy it straight from the
+    file, starting at the current offset.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.name = file.name
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _byte_range(request, size, etag, last_modified):
+    """(start, length) of a satisfiable single Range, None to send the whole file"""
+    match = _RANGE_RE.match(request.headers.get('Range', '').replace(' ', ''))
+    if not match or size == 0:
+        return None
+    # If-Range: only send part of the file if it is still the one the client has
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if_range_date = parse_http_date_safe(if_range)
+        if if_range_date is not None:
+            if if_range_date < last_modified:
+                return None
+        elif etag not in parse_etags(if_range):
+            return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        length = min(int(last), size)  # bytes=-N, the last N bytes
+        if not length:
+            raise ValueError('unsatisfiable range')  # bytes=-0
+        return size - length, length
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end - start + 1
+
+
+def _cache_control(path):
+    if any(path.startswith(directory) for directory in settings.MEDIA_IMMUTABLE_DIRS):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def serve_media(request, path):
+    """Response for the file at path (relative to MEDIA_ROOT)"""
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': _cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+            not_modified[header] = headers[header]
+        return not_modified
+
+    mode = settings.MEDIA_SERVE_MODE
+    if mode != 'django':
+        # The front-end server sends the bytes (and handles Range itself)
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + path)
+        else:
+            response['X-Sendfile'] = full_path
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    try:
+        byte_range = _byte_range(request, stat.st_size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    start, length = byte_range or (0, stat.st_size)
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=mimetypes.guess_type(full_path)[0] or 'application/octet-stream')
+    else:
+        response = FileResponse(FileRange(open(full_path, 'rb'), start, length))
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{start + length - 1}/{stat.st_size}'
+    response['Content-Length'] = length
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class MediaMiddleware:
+    """Serves MEDIA_URL with serve_media(), ahead of the rest of the stack"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.MEDIA_URL if settings.MEDIA_URL.startswith('/') else f'/{settings.MEDIA_URL}'
+        if settings.MEDIA_SERVE_MODE not in MODES:
+            raise ImproperlyConfigured(f'MEDIA_SERVE_MODE must be one of {", ".join(MODES)}')
+
+    def __call__(self, request):
+        if request.path_info.startswith(self.prefix):
+            try:
+                return serve_media(request, request.path_info[len(self.prefix):])
+            except Http404:
+                pass  # Let the URLconf produce the usual 404 page
+        return self.get_response(request)
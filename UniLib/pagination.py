@@ -0,0 +1,188 @@
+# UniLib/pagination.py
+"""
+Keyset ("cursor") pagination for the long, newest-first lists.
+
+Django's Paginator runs a COUNT and then LIMIT n OFFSET k, which walks and
+throws away k rows, so deep pages of the borrow log get slower and slower.
+CursorPaginator instead seeks past the last row of the previous page:
+
+    WHERE key < :key OR (key = :key AND id < :id)  ORDER BY key DESC, id DESC  LIMIT n + 1
+
+With an index on (key, id) every page costs the same as the first one.
+Cursors are signed, opaque tokens; a tampered or stale one falls back to
+the first page. The total is an approximate count that stops at
+APPROXIMATE_COUNT_LIMIT rows.
+
+?page=N requests keep the numbered Paginator pages for old links.
+"""
+
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+APPROXIMATE_COUNT_LIMIT = 1000
+CURSOR_SALT = 'unilib.pagination'
+NEXT, PREVIOUS = 'n', 'p'
+
+
+class CursorPage:
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None, params=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.params = params
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} rows>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    # Query strings for the navigation links, keeping the search/status filters
+    def _query(self, cursor):
+        params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params.pop('cursor', None)
+        if cursor:
+            params['cursor'] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+    @property
+    def first_query(self):
+        return self._query(None)
+
+    @property
+    def last_query(self):
+        return self._query(self.paginator.last_cursor)
+
+
+class CursorPaginator:
+    """Pages through queryset newest first on (key, pk)"""
+
+    def __init__(self, queryset, per_page, key):
+        self.queryset = queryset.order_by(f'-{key}', '-pk')
+        self.per_page = per_page
+        self.key = key
+        self.field = queryset.model._meta.get_field(key)
+
+    def encode(self, direction, obj=None):
+        position = None
+        if obj is not None:
+            value = getattr(obj, self.key)
+            position = [value.isoformat() if hasattr(value, 'isoformat') else value, obj.pk]
+        return signing.dumps([direction, position], salt=CURSOR_SALT, compress=True)
+
+    def decode(self, cursor):
+        try:
+            direction, position = signing.loads(cursor, salt=CURSOR_SALT)
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            if position is not None:
+                value, pk = position
+                position = (self.field.to_python(value), int(pk))
+        except (signing.BadSignature, TypeError, ValueError, ValidationError):
+            return NEXT, None
+        return direction, position
+
+    @property
+    def last_cursor(self):
+        # PREVIOUS from no position reads the oldest rows, i.e. the last page
+        return self.encode(PREVIOUS)
+
+    def page(self, cursor=None, params=None):
+        direction, position = self.decode(cursor) if cursor else (NEXT, None)
+        key, per_page = self.key, self.per_page
+
+        if direction == NEXT:
+            queryset = self.queryset
+            if position is not None:
+                value, pk = position
+                # The extra key <= value bound lets the database range-scan the index
+                queryset = queryset.filter(**{f'{key}__lte': value}).filter(
+                    Q(**{f'{key}__lt': value}) | Q(**{key: value, 'pk__lt': pk})
+                )
+            rows = list(queryset[:per_page + 1])
+            has_more = len(rows) > per_page
+            rows = rows[:per_page]
+            return CursorPage(
+                rows, self,
+                next_cursor=self.encode(NEXT, rows[-1]) if has_more else None,
+                previous_cursor=self.encode(PREVIOUS, rows[0]) if position is not None and rows else None,
+                params=params,
+            )
+
+        queryset = self.queryset.order_by(key, 'pk')
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(**{f'{key}__gte': value}).filter(
+                Q(**{f'{key}__gt': value}) | Q(**{key: value, 'pk__gt': pk})
+            )
+        rows = list(queryset[:per_page + 1])
+        has_more = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(
+            rows, self,
+            next_cursor=self.encode(NEXT, rows[-1]) if position is not None and rows else None,
+            previous_cursor=self.encode(PREVIOUS, rows[0]) if has_more else None,
+            params=params,
+        )
+
+    @cached_property
+    def count(self):
+        """Exact up to APPROXIMATE_COUNT_LIMIT rows, after that just the limit"""
+        return self.queryset[:APPROXIMATE_COUNT_LIMIT].count()
+
+    @property
+    def count_is_exact(self):
+        return self.count < APPROXIMATE_COUNT_LIMIT
+
+
+def paginate(request, queryset, per_page, key):
+    """
+    Return (paginator, page) for a list view: cursor pages by default,
+    the numbered Paginator when the request has ?page=N.
+    """
+    queryset = queryset.order_by(f'-{key}', '-pk')
+    if 'page' in request.GET:
+        paginator = Paginator(queryset, per_page)
+        return paginator, paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(queryset, per_page, key)
+    return paginator, paginator.page(request.GET.get('cursor'), params=request.GET)
+
+
+class CursorPaginationMixin:
+    """ListView mixin that paginates with paginate() on cursor_key"""
+    cursor_key = 'created_at'
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page = paginate(self.request, queryset, page_size, self.cursor_key)
+        return paginator, page, page.object_list, page.has_other_pages()
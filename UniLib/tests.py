@@ -0,0 +1,111 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.core import signing
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from books.models import Book
+from .media import serve_media
+from .pagination import CURSOR_SALT, CursorPaginator
+
+
+class MediaRangeTests(SimpleTestCase):
+    content = b'0123456789'
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with open(os.path.join(media_root.name, 'file.txt'), 'wb') as f:
+            f.write(self.content)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get(self, byte_range):
+        request = RequestFactory().get('/media/file.txt', headers={'Range': byte_range})
+        return serve_media(request, 'file.txt')
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_ranges(self):
+        for byte_range, expected in [
+            ('bytes=2-4', b'234'),
+            ('bytes=7-', b'789'),
+            ('bytes=-3', b'789'),
+            ('bytes=-50', self.content),
+        ]:
+            with self.subTest(byte_range):
+                response = self.get(byte_range)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(self.body(response), expected)
+
+    def test_unsatisfiable_ranges(self):
+        for byte_range in ['bytes=-0', 'bytes=10-', 'bytes=5-2']:
+            with self.subTest(byte_range):
+                response = self.get(byte_range)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */10')
+
+
+class CursorPaginatorTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.books = [Book.objects.create(title=f'Book {i}', author='A', isbn=f'K{i:04}') for i in range(7)]
+        # Pairs of books share created_at, so only the pk orders them
+        for i, book in enumerate(self.books):
+            Book.objects.filter(pk=book.pk).update(created_at=now - timedelta(minutes=i // 2))
+        self.newest_first = [book.pk for book in sorted(
+            Book.objects.all(), key=lambda book: (book.created_at, book.pk), reverse=True
+        )]
+        self.paginator = CursorPaginator(Book.objects.all(), 3, 'created_at')
+
+    def pks(self, page):
+        return [book.pk for book in page]
+
+    def test_next_pages_break_ties_on_pk(self):
+        first = self.paginator.page()
+        second = self.paginator.page(first.next_cursor)
+        last = self.paginator.page(second.next_cursor)
+        self.assertEqual(self.pks(first) + self.pks(second) + self.pks(last), self.newest_first)
+        self.assertFalse(first.has_previous())
+        self.assertTrue(second.has_previous())
+        self.assertFalse(last.has_next())
+
+    def test_previous_page(self):
+        second = self.paginator.page(self.paginator.page().next_cursor)
+        first = self.paginator.page(second.previous_cursor)
+        self.assertEqual(self.pks(first), self.newest_first[:3])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+    def test_last_page(self):
+        last = self.paginator.page(self.paginator.last_cursor)
+        self.assertEqual(self.pks(last), self.newest_first[-3:])
+        self.assertFalse(last.has_next())
+        self.assertEqual(self.pks(self.paginator.page(last.previous_cursor)), self.newest_first[1:4])
+
+    def test_bad_cursors_give_the_first_page(self):
+        first = self.pks(self.paginator.page())
+        cursor = self.paginator.page().next_cursor
+        for bad in [
+            'garbage',
+            cursor[:-2] + ('aa' if not cursor.endswith('aa') else 'bb'),  # Tampered signature
+            signing.dumps(['n', [timezone.now().isoformat(), 1]], salt='another.salt'),
+            signing.dumps(['n', ['not a date', 1]], salt=CURSOR_SALT, compress=True),
+            signing.dumps(['n', [timezone.now().isoformat()]], salt=CURSOR_SALT, compress=True),
+            signing.dumps(['x', None], salt=CURSOR_SALT, compress=True),
+            signing.dumps(42, salt=CURSOR_SALT, compress=True),
+        ]:
+            with self.subTest(bad):
+                self.assertEqual(self.pks(self.paginator.page(bad)), first)
+
+    def test_list_view_with_a_bad_cursor(self):
+        user = User.objects.create_user(username='reader', email='reader@example.com', university_id='reader')
+        self.client.force_login(user)
+        response = self.client.get(reverse('fine-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
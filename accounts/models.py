@@ -17,6 +17,9 @@ class User(AbstractUser):
     address = models.TextField(blank=True)
 
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
+
+    # Kept in sync by notifications.utils so the navbar badge needs no COUNT query
+    unread_notification_count = models.PositiveIntegerField(default=0, editable=False)
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.university_id})"
@@ -51,4 +54,9 @@ class User(AbstractUser):
             is_returned=False,
             due_date__lt=timezone.now().date()
         ).count()
-    
\ No newline at end of file
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the user list (UniLib/pagination.py)
+            models.Index(fields=['date_joined', 'id'], name='user_date_joined_idx'),
+        ]
@@ -11,6 +11,7 @@ from django.utils.encoding import force_bytes, force_str
 from django.contrib.auth.tokens import default_token_generator
 from django.template.loader import render_to_string
 from django.core.mail import EmailMultiAlternatives
+from notifications.outbox import queue_email
 from django.contrib import messages
 from django.urls import reverse
 
@@ -44,7 +45,7 @@ def register(request):
 
             email = EmailMultiAlternatives(email_subject, '', to=[user.email])
             email.attach_alternative(email_body, "text/html")
-            email.send()
+            queue_email(email)
 
             messages.success(request, 'Check your email to confirm your account.')
             return redirect('login')
@@ -114,7 +115,7 @@ def profile(request):
     return render(request, 'accounts/profile.html', context)
 
 
-from django.core.paginator import Paginator
+from UniLib.pagination import paginate
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.db.models import Q
 
@@ -133,14 +134,13 @@ def user_list(request):
             Q(university_id__icontains=search_query)
         )
 
-    paginator = Paginator(user_list, 10)  # Show 10 users per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Cursor pages on date_joined by default, ?page=N for numbered pages
+    paginator, page_obj = paginate(request, user_list, 10, 'date_joined')
     
     return render(request, 'accounts/user_list.html', {
         'users': page_obj,
         'page_obj': page_obj,  # This is needed for the pagination template tags
-        'is_paginated': paginator.num_pages > 1,  # This helps in template to check if pagination is needed
+        'is_paginated': page_obj.has_other_pages(),  # This helps in template to check if pagination is needed
         'search_query': search_query
     })
 
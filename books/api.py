@@ -0,0 +1,152 @@
+# books/api.py
+"""
+Read-only catalog API under /api/<version>/ (only v1 so far) for the kiosk
+and mobile clients.
+
+- ?fields=id,title,available_copies picks the book fields. Only their
+  columns are read and the category is only joined for category_name.
+- Book lists are keyset-paginated with UniLib.pagination, newest first
+  (?cursor=, ?page_size=), and filter on ?q=, ?category= and
+  ?available=true|false.
+- The ETag of every response is the catalog cache generation
+  (books/cache.py), which any Book, Category or Borrow change bumps, so a
+  matching If-None-Match is answered with a 304 before any query runs.
+  With a per-process (locmem) cache another worker's generation may not
+  have seen a change, so no ETag is sent and every request gets a 200.
+"""
+
+from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import GenericAPIView, ListAPIView, RetrieveAPIView
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from UniLib.pagination import CursorPaginator
+from .cache import catalog_generation, is_shared
+from .models import Book, Category
+from .search import search_books
+from .serializers import BookSerializer, CategorySerializer
+
+MAX_AVAILABILITY_IDS = 100
+
+
+def catalog_etag(request, *args, **kwargs):
+    if not is_shared():
+        return None
+    return f'catalog-{catalog_generation()}'
+
+
+class KeysetPagination(BasePagination):
+    """DRF adapter for UniLib.pagination.CursorPaginator on the view's cursor_key"""
+    page_size = 24
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        try:
+            per_page = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            per_page = self.page_size
+        per_page = min(max(per_page, 1), self.max_page_size)
+        self.request = request
+        self.page = CursorPaginator(queryset, per_page, view.cursor_key).page(request.query_params.get('cursor'))
+        return self.page.object_list
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'cursor')
+        return replace_query_param(url, 'cursor', cursor)
+
+
+@method_decorator(cache_control(public=True, no_cache=True), name='dispatch')
+@method_decorator(condition(etag_func=catalog_etag), name='dispatch')
+class CatalogAPIView(GenericAPIView):
+    """Base view: public, JSON only, revalidated with the catalog ETag on every use"""
+
+
+class BookAPIMixin:
+    serializer_class = BookSerializer
+    default_fields = BookSerializer.Meta.fields
+
+    @cached_property
+    def requested_fields(self):
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return self.default_fields
+        fields = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = set(fields) - set(BookSerializer.Meta.fields)
+        if unknown:
+            raise ValidationError({'fields': [f'Unknown field: {name}' for name in sorted(unknown)]})
+        return fields
+
+    def get_queryset(self):
+        fields = self.requested_fields
+        queryset = Book.objects.only(*BookSerializer.columns(fields), 'created_at')
+        if 'category_name' in fields:
+            queryset = queryset.select_related('category')
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.requested_fields
+        return super().get_serializer(*args, **kwargs)
+
+
+class BookListAPIView(BookAPIMixin, CatalogAPIView, ListAPIView):
+    pagination_class = KeysetPagination
+    cursor_key = 'created_at'
+    # Descriptions are long, ask for them with ?fields= or on the detail endpoint
+    default_fields = [name for name in BookSerializer.Meta.fields if name != 'description']
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('q'):
+            queryset = search_books(queryset, params['q'])
+        if params.get('category'):
+            try:
+                queryset = queryset.filter(category_id=int(params['category']))
+            except ValueError:
+                raise ValidationError({'category': ['A category id is required.']})
+        available = params.get('available')
+        if available in ('true', '1'):
+            queryset = queryset.filter(available_copies__gt=0)
+        elif available in ('false', '0'):
+            queryset = queryset.filter(available_copies=0)
+        return queryset
+
+
+class BookDetailAPIView(BookAPIMixin, CatalogAPIView, RetrieveAPIView):
+    pass
+
+
+class CategoryListAPIView(CatalogAPIView, ListAPIView):
+    serializer_class = CategorySerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return Category.objects.with_book_counts().order_by('name')
+
+
+class AvailabilityAPIView(CatalogAPIView):
+    """Copy counts for ?ids=1,2,3 (at most MAX_AVAILABILITY_IDS), for polling clients"""
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = {int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()}
+        except ValueError:
+            raise ValidationError({'ids': ['A comma separated list of book ids is required.']})
+        if len(ids) > MAX_AVAILABILITY_IDS:
+            raise ValidationError({'ids': [f'At most {MAX_AVAILABILITY_IDS} ids per request.']})
+        rows = Book.objects.filter(pk__in=ids).order_by('pk').values('id', 'total_copies', 'available_copies')
+        return Response({'results': list(rows)})
@@ -0,0 +1,9 @@
+from django.urls import path
+from .api import AvailabilityAPIView, BookDetailAPIView, BookListAPIView, CategoryListAPIView
+
+urlpatterns = [
+    path('books/', BookListAPIView.as_view(), name='api-book-list'),
+    path('books/<int:pk>/', BookDetailAPIView.as_view(), name='api-book-detail'),
+    path('categories/', CategoryListAPIView.as_view(), name='api-category-list'),
+    path('availability/', AvailabilityAPIView.as_view(), name='api-availability'),
+]
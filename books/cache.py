@@ -0,0 +1,77 @@
+# books/cache.py
+"""
+Catalog cache.
+
+Keys are built as  catalog:<name>:g<generation>  and Django adds the
+KEY_PREFIX and VERSION from settings.CACHES on top, so a stored key looks
+like  unilib:1:catalog:home:g1718000000000000042.
+
+- <generation> is one counter for the whole catalog, bumped by the signals
+  whenever a Book, Category or Borrow changes. Nothing ever has to find and
+  delete the old entries, they just stop being read and expire.
+- VERSION (CACHE_VERSION in the environment) is for deploys that change the
+  shape of cached data or a cached template fragment.
+
+Template fragments ({% cache %} in book_list.html) pass the generation as a
+vary_on argument, so they follow the same invalidation.
+
+The counter only invalidates what every process reads it from, so the
+cache backend has to be shared (see CACHES in settings). With locmem each
+gunicorn worker would keep its own counter and miss the others' changes;
+check_shared_cache() warns about that on `manage.py check --deploy`, and
+the API sends no catalog ETag unless is_shared() (books/api.py).
+"""
+
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+CATALOG_CACHE_TIMEOUT = 600  # seconds
+GENERATION_KEY = 'catalog:generation'
+
+
+def is_shared():
+    """Whether the default cache, and so the generation, is the same in every process"""
+    return settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+
+def catalog_generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock, so a counter that was evicted never comes back
+        # at a value that old entries were stored under
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY, 0)
+    return generation
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # No counter yet, so nothing cached under one either
+        pass
+
+
+def cached_catalog(name, compute):
+    """Return the cached value for name, computing and storing it on a miss"""
+    key = f'catalog:{name}:g{catalog_generation()}'
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    if not is_shared():
+        return [checks.Warning(
+            'The default cache is per-process, so catalog changes made through one '
+            'worker are not seen by the others.',
+            hint='Set CACHE_URL to a filecache:// or rediscache:// backend when running more than one process.',
+            id='books.W001',
+        )]
+    return []
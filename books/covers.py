@@ -0,0 +1,99 @@
+# books/covers.py
+"""
+Cover renditions.
+
+Uploaded covers are kept as they are, and every size in COVER_SIZES is
+written next to them in WebP and JPEG, once, when the cover is saved:
+
+    book_covers/renditions/<sha256 of the original, 20 chars>-<size>.<ext>
+
+The names only depend on the original's bytes, so a rendition never changes
+once it exists (it can be cached forever) and books sharing the same image
+share its files. Book.cover_renditions records what was written:
+
+    {'source': 'book_covers/x.jpg',
+     'sizes': {'card': {'width': 320, 'height': 480, 'webp': ..., 'jpg': ...}, ...}}
+
+and the {% cover_image %} tag turns that into a <picture> with srcset.
+"""
+
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+RENDITION_DIR = 'book_covers/renditions'
+COVER_SIZES = {  # name: width in px, the height follows the cover's aspect ratio
+    'thumb': 96,
+    'card': 320,
+    'detail': 640,
+}
+FORMATS = {  # extension: (Pillow format, save options)
+    'webp': ('WEBP', {'quality': 75, 'method': 6}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def rendition_name(digest, size, ext):
+    return f'{RENDITION_DIR}/{digest}-{size}.{ext}'
+
+
+def renditions_are_current(book):
+    source = book.cover_image.name if book.cover_image else ''
+    return (book.cover_renditions or {}).get('source', '') == source
+
+
+def _flatten(image):
+    """RGB copy of image, transparent areas on white (JPEG has no alpha)"""
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def build_renditions(cover):
+    """
+    Write the renditions of an ImageField file that are not in storage yet
+    and return the cover_renditions value describing them. Covers Pillow
+    can't read get no renditions and keep being served as uploaded.
+    """
+    if not cover:
+        return {}
+    try:
+        with cover.open('rb') as f:
+            data = f.read()
+        image = _flatten(Image.open(BytesIO(data)))
+    except OSError:
+        return {'source': cover.name, 'sizes': {}}
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    sizes = {}
+    for size, width in COVER_SIZES.items():
+        # Never upscale: a small original gives a smaller rendition, and the
+        # recorded width keeps the srcset descriptors honest
+        width = min(width, image.width)
+        height = max(round(image.height * width / image.width), 1)
+        resized = None
+        sizes[size] = {'width': width, 'height': height}
+        for ext, (fmt, options) in FORMATS.items():
+            name = rendition_name(digest, size, ext)
+            if not default_storage.exists(name):
+                if resized is None:
+                    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+                buffer = BytesIO()
+                resized.save(buffer, fmt, **options)
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            sizes[size][ext] = name
+    return {'source': cover.name, 'sizes': sizes}
+
+
+def update_renditions(book):
+    """Build book's renditions and store them without sending save signals"""
+    book.cover_renditions = build_renditions(book.cover_image)
+    type(book).objects.filter(pk=book.pk).update(cover_renditions=book.cover_renditions)
+    return book.cover_renditions
@@ -1,6 +1,7 @@
 import django_filters
 from .models import Book
-from django.db.models import Q
+from .search import search_books
+from .semantic import semantic_search
 
 class BookFilter(django_filters.FilterSet):
     q = django_filters.CharFilter(method='filter_by_all', label='Search')
@@ -10,8 +11,8 @@ class BookFilter(django_filters.FilterSet):
         fields = ['q', 'category']
 
     def filter_by_all(self, queryset, name, value):
-        return queryset.filter(
-            Q(title__icontains=value) |
-            Q(author__icontains=value) |
-            Q(isbn__icontains=value)
-        )
+        # Order by relevance unless the user picked an explicit sort
+        ranked = not (self.request and self.request.GET.get('sort'))
+        if self.request and self.request.GET.get('mode') == 'meaning':
+            return semantic_search(queryset, value, ranked=ranked)
+        return search_books(queryset, value, ranked=ranked)
@@ -44,4 +44,64 @@ class BookSearchForm(forms.Form):
         queryset=Category.objects.all(), 
         required=False,
         empty_label="All Categories"
-    )
\ No newline at end of file
+    )
+
+class BookImportRowForm(forms.Form):
+    """Validates one row of a book feed (see books/importer.py)"""
+    title = Book._meta.get_field('title').formfield()
+    author = Book._meta.get_field('author').formfield()
+    isbn = Book._meta.get_field('isbn').formfield()
+    publisher = Book._meta.get_field('publisher').formfield()
+    category = forms.CharField(max_length=100, required=False, help_text='Category name, created if missing')
+    publication_date = Book._meta.get_field('publication_date').formfield()
+    total_copies = forms.IntegerField(min_value=0, required=False)
+    description = Book._meta.get_field('description').formfield()
+
+    @classmethod
+    def clean_row(cls, row):
+        """
+        (cleaned data, errors) for one feed row. Calls the fields' clean()
+        directly: a form instance per row deep-copies every field, which
+        costs more than the validation itself on a 100k row feed.
+        """
+        data, errors = {}, {}
+        for name, field in cls.base_fields.items():
+            try:
+                data[name] = field.clean(row.get(name))
+            except forms.ValidationError as e:
+                errors[name] = e.messages
+        if data.get('total_copies') is None:
+            data['total_copies'] = 1
+        return data, errors
+
+
+# The upload page imports during the request, these keep it well inside gunicorn's 30s timeout
+MAX_UPLOAD_ROWS = 20_000  # imported at roughly 2,700 rows/sec
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # bytes
+
+
+class BookImportForm(forms.Form):
+    file = forms.FileField(help_text=(
+        f'CSV with a header row, JSON array or JSON Lines (one book per line), '
+        f'up to {MAX_UPLOAD_ROWS:,} rows and {MAX_UPLOAD_SIZE // (1024 * 1024)} MB'
+    ))
+
+    def clean_file(self):
+        """Refuse feeds too big to import within one request"""
+        from .importer import detect_format, read_rows
+
+        upload = self.cleaned_data['file']
+        too_big = forms.ValidationError(
+            f'Feeds over {MAX_UPLOAD_ROWS:,} rows or {MAX_UPLOAD_SIZE // (1024 * 1024)} MB can\'t be uploaded '
+            f'here, ask an administrator to run manage.py import_books with the file.'
+        )
+        if upload.size > MAX_UPLOAD_SIZE:
+            raise too_big
+        # Only parses the feed, a fraction of the import's cost
+        try:
+            for rows, _ in enumerate(read_rows(upload.open('rb'), detect_format(upload.name)), start=1):
+                if rows > MAX_UPLOAD_ROWS:
+                    raise too_big
+        except UnicodeDecodeError:
+            raise forms.ValidationError('The feed must be UTF-8 encoded.')
+        return upload
@@ -0,0 +1,230 @@
+# books/importer.py
+"""
+Bulk catalog import, used by `manage.py import_books` and the staff upload
+page (BookImportView).
+
+The upload page imports during the request, so BookImportForm refuses
+feeds over MAX_UPLOAD_SIZE or MAX_UPLOAD_ROWS rows (books/forms.py),
+about 8 seconds of work, well inside the 30 second worker timeout.
+Bigger feeds go through the command.
+
+Feeds are read a row at a time, so their size doesn't matter:
+
+- CSV with a header row (title, author, isbn, publisher, category,
+  publication_date, total_copies, description),
+- a JSON array of objects with the same keys, or JSON Lines.
+
+Every row is validated with BookImportRowForm, then the rows are upserted
+by ISBN in batches with a single INSERT ... ON CONFLICT (isbn) DO UPDATE.
+Existing books keep their available_copies (clamped to total_copies, like
+Book.save() does), new ones start with every copy available. Categories
+are looked up by name and created when missing. Within one batch the last
+row for an ISBN wins.
+
+bulk_create() sends no signals, so each batch also creates the
+BookPopularity rows and updates the search index itself, and the catalog
+cache is invalidated once at the end.
+"""
+
+import csv
+import io
+import json
+import time
+
+from django.db import transaction
+from django.db.models import F
+
+from .cache import invalidate_catalog
+from .forms import BookImportRowForm
+from .models import Book, BookPopularity, Category
+from .search import index_books
+
+BATCH_SIZE = 1000
+MAX_STORED_ERRORS = 1000  # kept on ImportResult, the on_error callback sees all of them
+FORMATS = ('csv', 'json')
+UPDATE_FIELDS = [
+    'title', 'author', 'publisher', 'category', 'publication_date',
+    'total_copies', 'description', 'updated_at',
+]
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []  # (row number, message), the first MAX_STORED_ERRORS only
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, row, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_STORED_ERRORS:
+            self.errors.append((row, message))
+
+
+def detect_format(filename):
+    return 'csv' if str(filename).lower().endswith('.csv') else 'json'
+
+
+def read_rows(binary_file, format):
+    """Yield (row number, dict) from a CSV or JSON feed opened in binary mode"""
+    if format not in FORMATS:
+        raise ValueError(f'Unknown format {format!r}, expected one of {", ".join(FORMATS)}')
+    # utf-8-sig drops the BOM spreadsheet exports start with
+    text = io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+    try:
+        yield from _text_rows(text, format)
+    finally:
+        # Leave binary_file open, the upload form reads it twice
+        text.detach()
+
+
+def _text_rows(text, format):
+    if format == 'csv':
+        reader = csv.DictReader(text)
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    first = text.read(1)
+    while first.isspace():
+        first = text.read(1)
+    if first == '[':
+        yield from _json_array_items(text)
+        return
+    for number, line in enumerate(text, start=1):
+        if number == 1:
+            line = first + line
+        if line.strip():
+            yield number, _json_value(line)
+
+
+def _json_value(text):
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        return e
+
+
+def _json_array_items(text, chunk_size=64 * 1024):
+    """Items of a JSON array whose opening [ was already read, one at a time"""
+    decoder = json.JSONDecoder()
+    buffer, position, number = '', 0, 0
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position == len(buffer):
+            buffer, position = text.read(chunk_size), 0
+            if not buffer:
+                return  # Unterminated array, take what was complete
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            chunk = text.read(chunk_size)
+            if not chunk:
+                yield number + 1, e
+                return
+            # The item continues in the next chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        number += 1
+        yield number, value
+        position = end
+
+
+def import_books(rows, batch_size=BATCH_SIZE, on_batch=None, on_error=None):
+    """
+    Validate and upsert (row number, dict) pairs from read_rows(). on_batch
+    is called with the ImportResult after every saved batch, on_error with
+    (row number, message) for every rejected row.
+    """
+    result = ImportResult()
+    categories = dict(Category.objects.values_list('name', 'pk'))
+    batch = {}
+
+    for number, row in rows:
+        result.rows += 1
+        book, error = _build_book(row, categories)
+        if error:
+            result.add_error(number, error)
+            if on_error:
+                on_error(number, error)
+            continue
+        batch[book.isbn] = book
+        if len(batch) >= batch_size:
+            _save_batch(batch, result)
+            batch = {}
+            if on_batch:
+                on_batch(result)
+
+    if batch:
+        _save_batch(batch, result)
+        if on_batch:
+            on_batch(result)
+    result.elapsed = time.perf_counter() - result.started
+    if result.created or result.updated:
+        invalidate_catalog()
+    return result
+
+
+def _build_book(row, categories):
+    """(unsaved Book, None) for a valid row, (None, error message) otherwise"""
+    if isinstance(row, Exception):
+        return None, f'Invalid JSON: {row}'
+    if not isinstance(row, dict):
+        return None, 'Expected an object with the book fields'
+    data, errors = BookImportRowForm.clean_row({key.strip().lower(): value for key, value in row.items() if key})
+    if errors:
+        return None, '; '.join(f'{field}: {" ".join(messages)}' for field, messages in errors.items())
+    category_id = None
+    if data['category']:
+        category_id = categories.get(data['category'])
+        if category_id is None:
+            category_id = categories[data['category']] = Category.objects.get_or_create(name=data['category'])[0].pk
+    return Book(
+        title=data['title'],
+        author=data['author'],
+        isbn=data['isbn'],
+        publisher=data['publisher'],
+        category_id=category_id,
+        publication_date=data['publication_date'],
+        total_copies=data['total_copies'],
+        available_copies=data['total_copies'],
+        description=data['description'],
+    ), None
+
+
+def _save_batch(batch, result):
+    isbns = list(batch)
+    with transaction.atomic():
+        existing = Book.objects.filter(isbn__in=isbns).count()
+        Book.objects.bulk_create(
+            batch.values(),
+            update_conflicts=True,
+            unique_fields=['isbn'],
+            update_fields=UPDATE_FIELDS,
+        )
+        # A lower total_copies can leave more copies available than exist
+        Book.objects.filter(isbn__in=isbns, available_copies__gt=F('total_copies')).update(
+            available_copies=F('total_copies')
+        )
+        books = Book.objects.filter(isbn__in=isbns)
+        BookPopularity.objects.bulk_create(
+            [BookPopularity(book_id=book_id)
+             for book_id in books.filter(popularity__isnull=True).values_list('pk', flat=True)],
+            ignore_conflicts=True,
+        )
+        index_books(list(books.values_list('pk', flat=True)))
+    result.created += len(batch) - existing
+    result.updated += existing
+    result.elapsed = time.perf_counter() - result.started
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+# One page of the catalog, as the kiosks fetch it today (HTML) and from the API
+CASES = [
+    ('html  /books/', '/books/', {}),
+    ('api   /api/v1/books/ (all fields)', '/api/v1/books/?page_size=12', {}),
+    ('api   ?fields=id,title,available_copies', '/api/v1/books/?page_size=12&fields=id,title,available_copies', {}),
+    ('api   If-None-Match (304)', '/api/v1/books/?page_size=12', {'etag': True}),
+    ('api   /api/v1/availability/', '/api/v1/availability/?ids=' + ','.join(map(str, range(1, 13))), {}),
+]
+
+
+class Command(BaseCommand):
+    help = ('Compare latency, queries and bytes of the HTML catalog page with the '
+            'JSON catalog API, in process with the test client against the configured database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per case')
+
+    def handle(self, *args, **options):
+        client = Client()
+        for label, url, case in CASES:
+            headers = {}
+            if case.get('etag'):
+                headers['If-None-Match'] = client.get(url)['ETag']
+            response = client.get(url, headers=headers)  # warm up caches
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, headers=headers)
+            # Read it now, every request_started signal resets connection.queries
+            query_count = len(queries)
+            size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+
+            start = time.perf_counter()
+            for _ in range(options['requests']):
+                client.get(url, headers=headers)
+            elapsed = time.perf_counter() - start
+
+            self.stdout.write(
+                f'{label:<42} {response.status_code}  {elapsed / options["requests"] * 1000:7.2f} ms  '
+                f'{options["requests"] / elapsed:8.1f} req/s  {query_count:3d} queries  {size:8d} bytes'
+            )
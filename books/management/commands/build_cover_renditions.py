@@ -0,0 +1,53 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from books.cache import invalidate_catalog
+from books.covers import RENDITION_DIR, renditions_are_current, update_renditions
+from books.models import Book
+
+class Command(BaseCommand):
+    help = 'Build the resized WebP/JPEG cover renditions for books that are missing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild every book, not only covers that changed since the last build')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete rendition files no book refers to any more')
+
+    def handle(self, *args, **options):
+        built = 0
+        books = Book.objects.only('pk', 'cover_image', 'cover_renditions').order_by('pk')
+        for book in books.iterator(chunk_size=200):
+            if not options['force'] and renditions_are_current(book):
+                continue
+            try:
+                update_renditions(book)
+            except FileNotFoundError:
+                self.stderr.write(f'Book {book.pk}: cover file {book.cover_image.name} is missing')
+                continue
+            built += 1
+        if built:
+            # update() sends no signals, the catalog pages are cached
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'Built cover renditions for {built} books'))
+
+        if options['prune']:
+            self.stdout.write(self.style.SUCCESS(f'Pruned {self._prune()} unused rendition files'))
+
+    def _prune(self):
+        used = {
+            name
+            for renditions in Book.objects.values_list('cover_renditions', flat=True)
+            for rendition in (renditions or {}).get('sizes', {}).values()
+            for key, name in rendition.items() if key not in ('width', 'height')
+        }
+        try:
+            _, files = default_storage.listdir(RENDITION_DIR)
+        except FileNotFoundError:
+            return 0
+        pruned = 0
+        for filename in files:
+            name = f'{RENDITION_DIR}/{filename}'
+            if name not in used:
+                default_storage.delete(name)
+                pruned += 1
+        return pruned
@@ -0,0 +1,53 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from books.models import BookRecommendation
+from books.recommendations import TOP_K, load_borrow_matrix, recommendations_for, save_recommendations, similar_books
+
+class Command(BaseCommand):
+    help = 'Rebuild the "readers also borrowed" recommendations from the borrow history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=TOP_K, help='Recommendations stored per book')
+        parser.add_argument('--min-co-borrowers', type=int, default=1,
+                            help='Readers two books need in common to be recommended together')
+        parser.add_argument('--lookups', type=int, default=0,
+                            help='Afterwards, time this many detail page lookups of random books')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        matrix, book_ids = load_borrow_matrix()
+        loaded = time.perf_counter()
+        self.stdout.write(
+            f'Loaded {matrix.nnz} reader/book pairs ({matrix.shape[0]} readers, {matrix.shape[1]} books) '
+            f'in {loaded - start:.2f}s'
+        )
+
+        # Materialized so the similarity and the save are timed separately
+        chunks = list(similar_books(matrix, book_ids, options['top'], options['min_co_borrowers']))
+        computed = time.perf_counter()
+        self.stdout.write(f'Computed similarities in {computed - loaded:.2f}s')
+
+        saved = save_recommendations(chunks)
+        saved_at = time.perf_counter()
+        self.stdout.write(f'Saved {saved} recommendations in {saved_at - computed:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt recommendations in {saved_at - start:.2f}s'))
+
+        if options['lookups']:
+            self._time_lookups(options['lookups'])
+
+    def _time_lookups(self, count):
+        books = list(BookRecommendation.objects.values_list('book_id', flat=True).distinct().order_by())
+        if not books:
+            return
+        timings = []
+        for book_id in random.choices(books, k=count):
+            start = time.perf_counter()
+            recommendations_for(book_id)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f'{count} lookups: median {timings[len(timings) // 2] * 1000:.3f} ms, '
+            f'p99 {timings[int(len(timings) * 0.99)] * 1000:.3f} ms'
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from books.semantic import SemanticIndex, build_index
+
+class Command(BaseCommand):
+    help = 'Embed new and changed books into the "search by meaning" index (books/semantic.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Re-embed every book and recompute the word weights')
+        parser.add_argument('--bench', metavar='QUERY', action='append', default=[],
+                            help='Afterwards, time searches for QUERY (repeatable)')
+        parser.add_argument('--repeat', type=int, default=200, help='Searches per --bench query')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = build_index(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Embedded {result['embedded']} books, dropped {result['dropped']}, "
+            f"{result['books']} indexed ({time.perf_counter() - start:.2f}s)"
+        ))
+
+        if options['bench']:
+            start = time.perf_counter()
+            index = SemanticIndex.open()
+            self.stdout.write(f'Opened the index in {(time.perf_counter() - start) * 1000:.1f} ms')
+            for query in options['bench']:
+                timings = []
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    hits = index.search(query)
+                    timings.append(time.perf_counter() - start)
+                timings.sort()
+                self.stdout.write(
+                    f'{query!r}: {len(hits)} results, median {timings[len(timings) // 2] * 1000:.2f} ms, '
+                    f'p99 {timings[int(len(timings) * 0.99)] * 1000:.2f} ms'
+                )
@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from books.importer import BATCH_SIZE, FORMATS, detect_format, import_books, read_rows
+
+class Command(BaseCommand):
+    help = 'Import or update books (matched by ISBN) from a CSV or JSON feed, streaming it in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Feed to import, '-' reads standard input")
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Defaults to csv for *.csv files and json (array or JSON Lines) otherwise')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or detect_format(path)
+        try:
+            feed = sys.stdin.buffer if path == '-' else open(path, 'rb')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+        with feed:
+            result = import_books(
+                read_rows(feed, format),
+                batch_size=options['batch_size'],
+                on_batch=self.report_progress,
+                on_error=lambda row, message: self.stderr.write(f'Row {row}: {message}'),
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.rows} rows in {result.elapsed:.1f}s ({result.rows_per_second:.0f} rows/sec): '
+            f'{result.created} created, {result.updated} updated, {result.error_count} rejected'
+        ))
+
+    def report_progress(self, result):
+        self.stdout.write(f'{result.rows} rows, {result.rows_per_second:.0f} rows/sec')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from books.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalog full-text search index from the books table'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(
+            self.style.SUCCESS(f'Search index rebuilt for {count} books')
+        )
@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+from books.cache import invalidate_catalog
+from books.models import Book, BookPopularity
+from transactions.models import Borrow
+
+class Command(BaseCommand):
+    help = 'Recompute book popularity counters (lifetime, 7 and 30 days) from borrow history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        today = timezone.now().date()
+
+        # Migration 0003_bookpopularity backfilled with a frozen copy of this query
+        counts = {
+            row['book_id']: row
+            for row in Borrow.objects.values('book_id').annotate(
+                total=Count('id'),
+                last_7=Count('id', filter=Q(issue_date__gt=today - timedelta(days=7))),
+                last_30=Count('id', filter=Q(issue_date__gt=today - timedelta(days=30))),
+            ).order_by()
+        }
+
+        batch = []
+        updated = 0
+        for book_id in Book.objects.values_list('pk', flat=True).iterator(chunk_size=batch_size):
+            row = counts.get(book_id, {})
+            batch.append(BookPopularity(
+                book_id=book_id,
+                total_borrows=row.get('total', 0),
+                borrows_last_7_days=row.get('last_7', 0),
+                borrows_last_30_days=row.get('last_30', 0),
+            ))
+            if len(batch) >= batch_size:
+                updated += self._save(batch)
+                batch = []
+        if batch:
+            updated += self._save(batch)
+        # bulk_create sends no signals, the popular lists are cached
+        invalidate_catalog()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled popularity counters for {updated} books')
+        )
+
+    def _save(self, batch):
+        BookPopularity.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['book'],
+            update_fields=['total_borrows', 'borrows_last_7_days', 'borrows_last_30_days', 'updated_at'],
+        )
+        return len(batch)
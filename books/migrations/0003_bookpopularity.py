@@ -0,0 +1,62 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:53
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+# A frozen copy of the aggregation in `manage.py reconcile_popularity`, on
+# the historical models: this migration must keep backfilling the counters
+# the way they were defined here, whatever the command does later.
+def backfill_popularity(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookPopularity = apps.get_model('books', 'BookPopularity')
+    Borrow = apps.get_model('transactions', 'Borrow')
+
+    today = timezone.now().date()
+    counts = {
+        row['book_id']: row
+        for row in Borrow.objects.values('book_id').annotate(
+            total=Count('id'),
+            last_7=Count('id', filter=Q(issue_date__gt=today - timedelta(days=7))),
+            last_30=Count('id', filter=Q(issue_date__gt=today - timedelta(days=30))),
+        ).order_by()
+    }
+    BookPopularity.objects.bulk_create([
+        BookPopularity(
+            book_id=book_id,
+            total_borrows=counts.get(book_id, {}).get('total', 0),
+            borrows_last_7_days=counts.get(book_id, {}).get('last_7', 0),
+            borrows_last_30_days=counts.get(book_id, {}).get('last_30', 0),
+        )
+        for book_id in Book.objects.values_list('pk', flat=True)
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0002_book_search_index'),
+        ('transactions', '0004_borrow_overdue_notification_sent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookPopularity',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='books.book')),
+                ('total_borrows', models.PositiveIntegerField(default=0)),
+                ('borrows_last_7_days', models.PositiveIntegerField(default=0)),
+                ('borrows_last_30_days', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'book popularity',
+                'indexes': [models.Index(fields=['-total_borrows', 'book'], name='books_pop_total_idx'), models.Index(fields=['-borrows_last_7_days', 'book'], name='books_pop_7d_idx'), models.Index(fields=['-borrows_last_30_days', 'book'], name='books_pop_30d_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_popularity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Postgres only, SQLite is served by the FTS5 table and the Meta indexes
+TRIGRAM_INDEXES = {
+    'books_book_title_trgm': 'title',
+    'books_book_author_trgm': 'author',
+}
+AVAILABLE_INDEX = 'books_book_available_recent_idx'
+
+
+def create_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+    from django.db.models import Index, Q
+    from django.db.models.functions import Upper
+
+    Book = apps.get_model('books', 'Book')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # icontains compiles to UPPER(col) LIKE UPPER(%s), so index that expression.
+    # Used by the borrow list search on book__title / book__author.
+    for name, field in TRIGRAM_INDEXES.items():
+        schema_editor.add_index(Book, GinIndex(OpClass(Upper(field), name='gin_trgm_ops'), name=name))
+    # Catalog filtered to available books (featured books, ?availability=available), newest first
+    schema_editor.add_index(Book, Index(
+        fields=['-created_at'], condition=Q(available_copies__gt=0), name=AVAILABLE_INDEX
+    ))
+
+
+def drop_postgres_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in [*TRIGRAM_INDEXES, AVAILABLE_INDEX]:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_bookpopularity'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_postgres_indexes, drop_postgres_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_bookrecommendation'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookpopularity',
+            name='books_pop_total_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bookpopularity',
+            index=models.Index(fields=['-total_borrows', '-book'], name='books_pop_total_idx'),
+        ),
+    ]
@@ -1,16 +1,41 @@
 # books/models.py
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse_lazy
 
+class CategoryQuerySet(models.QuerySet):
+    def with_book_counts(self):
+        """Annotate book_count and available_book_count so templates don't COUNT per row"""
+        return self.annotate(
+            book_count=models.Count('book'),
+            available_book_count=models.Count('book', filter=models.Q(book__available_copies__gt=0)),
+        )
+
+    def with_preview_books(self, limit):
+        """Prefetch the first `limit` books (by title) of every category as preview_books"""
+        return self.prefetch_related(models.Prefetch(
+            'book_set', queryset=Book.objects.order_by('title')[:limit], to_attr='preview_books'
+        ))
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
+
+    objects = CategoryQuerySet.as_manager()
     
     def __str__(self):
         return self.name
 
+class BookQuerySet(models.QuerySet):
+    def popular(self):
+        """Most borrowed first (newest book first on ties), read from the denormalized BookPopularity counters"""
+        return self.filter(popularity__isnull=False).annotate(
+            borrow_count=F('popularity__total_borrows')
+        ).order_by('-popularity__total_borrows', '-popularity__book_id')  # book_id is the pk, and in the index
+
 class Book(models.Model):
     title = models.CharField(max_length=200)
     author = models.CharField(max_length=100)
@@ -21,9 +46,13 @@ class Book(models.Model):
     total_copies = models.PositiveIntegerField(default=1)
     available_copies = models.PositiveIntegerField(default=1)
     cover_image = models.ImageField(upload_to='book_covers/', blank=True, null=True)
+    # Resized WebP/JPEG copies of cover_image, see books/covers.py
+    cover_renditions = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.title} by {self.author}"
@@ -42,4 +71,67 @@ class Book(models.Model):
         super().save(*args, **kwargs)
   
     class Meta:
-        ordering = ['title']
\ No newline at end of file
+        ordering = ['title']
+
+
+class BookPopularity(models.Model):
+    """
+    Borrow counters per book, so "popular" rankings don't GROUP BY the whole
+    borrow history. New borrows increment every counter; the rolling 7/30 day
+    windows only shrink when `manage.py reconcile_popularity` recomputes them.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    total_borrows = models.PositiveIntegerField(default=0)
+    borrows_last_7_days = models.PositiveIntegerField(default=0)
+    borrows_last_30_days = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.book} borrowed {self.total_borrows} times"
+
+    @classmethod
+    def record_borrow(cls, book_id):
+        counters = {
+            'total_borrows': F('total_borrows') + 1,
+            'borrows_last_7_days': F('borrows_last_7_days') + 1,
+            'borrows_last_30_days': F('borrows_last_30_days') + 1,
+            'updated_at': timezone.now(),
+        }
+        if cls.objects.filter(book_id=book_id).update(**counters):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(book_id=book_id, total_borrows=1,
+                                   borrows_last_7_days=1, borrows_last_30_days=1)
+        except IntegrityError:
+            # Another request created the row first
+            cls.objects.filter(book_id=book_id).update(**counters)
+
+    class Meta:
+        verbose_name_plural = 'book popularity'
+        indexes = [
+            models.Index(fields=['-total_borrows', '-book'], name='books_pop_total_idx'),  # popular() order
+            models.Index(fields=['-borrows_last_7_days', 'book'], name='books_pop_7d_idx'),
+            models.Index(fields=['-borrows_last_30_days', 'book'], name='books_pop_30d_idx'),
+        ]
+
+
+class BookRecommendation(models.Model):
+    """
+    "Readers also borrowed": the books most often borrowed by the same
+    readers, best first. Rebuilt by `manage.py build_recommendations`,
+    see books/recommendations.py.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()  # cosine similarity of the two books' borrowers
+
+    def __str__(self):
+        return f"{self.recommended} for {self.book} (#{self.rank + 1})"
+
+    class Meta:
+        constraints = [
+            # Also the index BookDetailView reads a book's list with
+            models.UniqueConstraint(fields=['book', 'rank'], name='book_recommendation_rank_uniq'),
+        ]
@@ -0,0 +1,101 @@
+# books/recommendations.py
+"""
+"Readers also borrowed" recommendations, rebuilt in a batch by
+`manage.py build_recommendations` and shown on the book detail page.
+
+The borrow history becomes a sparse binary user x book matrix X (a reader
+either borrowed a book or didn't). X.T @ X counts the co-borrowers of every
+pair of books, and dividing by sqrt(borrowers of a * borrowers of b) turns
+that into the cosine similarity of the two books. The product is computed
+for CHUNK_SIZE books at a time to keep memory bounded, and the top K of
+each row are picked with a single lexsort over the chunk's non-zeros.
+Ties go to the more borrowed book.
+
+The result replaces the BookRecommendation table in one transaction, so a
+book's list is one query on the (book, rank) unique index.
+"""
+
+from itertools import chain
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+
+from transactions.models import Borrow
+from .cache import invalidate_catalog
+from .models import BookRecommendation
+
+TOP_K = 10  # stored per book
+SHOWN = 6  # on the detail page
+CHUNK_SIZE = 2048  # books per sparse product
+LOAD_CHUNK_SIZE = 50_000
+SAVE_BATCH_SIZE = 5000
+
+
+def load_borrow_matrix():
+    """(binary users x books CSR matrix, book id of every column) from the borrow history"""
+    pairs = Borrow.objects.values_list('user_id', 'book_id').order_by().iterator(chunk_size=LOAD_CHUNK_SIZE)
+    flat = np.fromiter(chain.from_iterable(pairs), dtype=np.int64)
+    users, books = flat[0::2], flat[1::2]
+    user_ids, rows = np.unique(users, return_inverse=True)
+    book_ids, columns = np.unique(books, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=(len(user_ids), len(book_ids))
+    )
+    # Borrowing a book twice doesn't make it count twice
+    matrix.data[:] = 1
+    return matrix, book_ids
+
+
+def similar_books(matrix, book_ids, k=TOP_K, min_co_borrowers=1):
+    """
+    Yield (book ids, recommended book ids, ranks, scores) arrays, one set per
+    chunk of books, with up to k recommendations per book.
+    """
+    by_book = matrix.T.tocsr()
+    borrowers = np.asarray(matrix.sum(axis=0)).ravel().astype(np.float64)
+    for start in range(0, by_book.shape[0], CHUNK_SIZE):
+        co_borrowers = (by_book[start:start + CHUNK_SIZE] @ matrix).tocoo()
+        rows = co_borrowers.row.astype(np.int64) + start
+        columns = co_borrowers.col.astype(np.int64)
+        keep = (rows != columns) & (co_borrowers.data >= min_co_borrowers)
+        rows, columns, counts = rows[keep], columns[keep], co_borrowers.data[keep]
+        if not len(rows):
+            continue
+        scores = counts / np.sqrt(borrowers[rows] * borrowers[columns])
+
+        # Each book's candidates together, best score first, then the most borrowed
+        order = np.lexsort((columns, -borrowers[columns], -scores, rows))
+        rows, columns, scores = rows[order], columns[order], scores[order]
+        row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        ranks = np.arange(len(rows)) - np.repeat(row_starts, np.diff(np.r_[row_starts, len(rows)]))
+        top = ranks < k
+        yield book_ids[rows[top]], book_ids[columns[top]], ranks[top], scores[top]
+
+
+def save_recommendations(chunks):
+    """Replace every stored recommendation with chunks from similar_books(); returns how many"""
+    saved = 0
+    with transaction.atomic():
+        BookRecommendation.objects.all().delete()
+        for books, recommended, ranks, scores in chunks:
+            rows = [
+                BookRecommendation(book_id=book, recommended_id=other, rank=rank, score=score)
+                for book, other, rank, score in zip(
+                    books.tolist(), recommended.tolist(), ranks.tolist(), scores.tolist()
+                )
+            ]
+            BookRecommendation.objects.bulk_create(rows, batch_size=SAVE_BATCH_SIZE)
+            saved += len(rows)
+    # The detail page caches the lists with the catalog
+    invalidate_catalog()
+    return saved
+
+
+def recommendations_for(book_id, limit=SHOWN):
+    """The books to show under book_id, best first"""
+    return [
+        recommendation.recommended
+        for recommendation in BookRecommendation.objects.filter(book_id=book_id)
+        .select_related('recommended').order_by('rank')[:limit]
+    ]
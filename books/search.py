@@ -0,0 +1,124 @@
+# books/search.py
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Book
+
+FTS_TABLE = 'books_book_fts'
+SEARCH_FIELDS = ('title', 'author', 'isbn')
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(value):
+    return _TOKEN_RE.findall(value or '')
+
+
+def search_vector():
+    """tsvector expression shared by the Postgres GIN index and the queries"""
+    from django.contrib.postgres.search import SearchVector
+    return SearchVector(*SEARCH_FIELDS, config='simple')
+
+
+def search_books(queryset, value, ranked=False):
+    """
+    Filter a Book queryset by a free-text catalog query.
+
+    Every word is matched as a prefix, so "harr pot" finds "Harry Potter".
+    SQLite uses the FTS5 table, Postgres uses the GIN-indexed tsvector and
+    anything else falls back to icontains lookups. With ranked=True the
+    results are ordered by relevance (best match first).
+    """
+    tokens = _tokens(value)
+    if not tokens:
+        return queryset
+
+    if connection.vendor == 'sqlite':
+        # Quote every token so FTS5 operators in user input are treated as text
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        if ranked:
+            # Join the FTS table once and sort on its rank, bm25(), where lower means a better match
+            return queryset.extra(
+                tables=[FTS_TABLE],
+                where=[f'{FTS_TABLE}.rowid = {Book._meta.db_table}.id', f'{FTS_TABLE} MATCH %s'],
+                params=[match],
+                select={'search_rank': f'{FTS_TABLE}.rank'},
+                order_by=['search_rank'],
+            )
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+        ))
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        query = SearchQuery(
+            ' & '.join(f'{token}:*' for token in tokens),
+            search_type='raw', config='simple'
+        )
+        queryset = queryset.annotate(search_document=search_vector()).filter(search_document=query)
+        if ranked:
+            queryset = queryset.annotate(
+                search_rank=SearchRank(search_vector(), query)
+            ).order_by('-search_rank')
+        return queryset
+
+    condition = Q()
+    for token in tokens:
+        condition &= (
+            Q(title__icontains=token) |
+            Q(author__icontains=token) |
+            Q(isbn__icontains=token)
+        )
+    return queryset.filter(condition)
+
+
+def index_book(book):
+    """Write (or rewrite) a single book's FTS5 row"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [book.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) VALUES (%s, %s, %s, %s)',
+            [book.pk, book.title, book.author, book.isbn]
+        )
+
+
+def index_books(book_ids):
+    """index_book() for many books at once, read straight from the books table"""
+    if connection.vendor != 'sqlite' or not book_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(book_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', book_ids)
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) '
+            f'SELECT id, title, author, isbn FROM {Book._meta.db_table} WHERE id IN ({placeholders})',
+            book_ids
+        )
+
+
+def unindex_book(book_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [book_id])
+
+
+def rebuild_index():
+    """Rebuild the whole search index from the books table, returns the row count"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, author, isbn) '
+                f'SELECT id, title, author, isbn FROM {Book._meta.db_table}'
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute('REINDEX INDEX books_book_search_gin')
+    return Book.objects.count()
@@ -0,0 +1,301 @@
+# books/semantic.py
+"""
+Search the catalog by meaning ("search by meaning" on the book list).
+
+`manage.py build_semantic_index` embeds every book offline with the spaCy
+pipeline in SEMANTIC_SEARCH_MODEL (en_core_web_sm by default). Title,
+description and category are split into lowercase words. Each distinct
+word gets the pipeline's vector for it. A book is the IDF-weighted sum of
+its words' vectors (title words count TITLE_WEIGHT times), normalised to
+unit length. Queries are embedded the same way, from the stored word
+vectors, so requests never load spaCy. A query word no book uses is
+ignored.
+
+The index lives in SEMANTIC_INDEX_DIR as .npy files, opened with
+mmap_mode='r' so every gunicorn worker shares one copy through the page
+cache, plus meta.json naming the current files. A search is one float32
+matrix-vector product and an argpartition.
+
+Builds are incremental: only books whose updated_at is past the last
+build's watermark (or that are missing from the index) are embedded again
+(renaming or deleting a category touches its books, books/signals.py),
+deleted books are dropped, and new words get the highest IDF. `--full`
+recomputes the IDF weights from scratch. Every build writes a new
+generation of files and replaces meta.json last, so readers never see a
+half-written index; workers notice the new meta.json on their next search.
+"""
+
+import json
+import math
+import os
+import re
+
+import numpy as np
+from scipy import sparse
+from django.conf import settings
+from django.db.models import Case, IntegerField, When
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Book
+from .search import search_books
+
+TITLE_WEIGHT = 2.0
+MIN_SCORE = 0.3  # cosine similarity below which a book isn't a result
+RESULTS = 60
+FETCH_CHUNK_SIZE = 500
+META_FILE = 'meta.json'
+
+_WORD_RE = re.compile(r'[^\W\d_]{2,}', re.UNICODE)
+
+
+def words(text):
+    return _WORD_RE.findall((text or '').lower())
+
+
+def _path(name):
+    return os.path.join(settings.SEMANTIC_INDEX_DIR, name)
+
+
+class SemanticIndex:
+    """The memory-mapped vectors named by one meta.json"""
+
+    def __init__(self, meta):
+        self.meta = meta
+        files = meta['files']
+        self.book_ids = np.load(_path(files['book_ids']), mmap_mode='r')
+        self.book_vectors = np.load(_path(files['book_vectors']), mmap_mode='r')
+        self.word_vectors = np.load(_path(files['word_vectors']), mmap_mode='r')
+        self.idf = np.load(_path(files['idf']), mmap_mode='r')
+        with open(_path(files['words']), encoding='utf-8') as f:
+            self.words = json.load(f)
+        self.word_rows = {word: row for row, word in enumerate(self.words)}
+
+    @classmethod
+    def open(cls):
+        """The current index, None if it hasn't been built"""
+        try:
+            with open(_path(META_FILE), encoding='utf-8') as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            return None
+
+    @property
+    def updated_at(self):
+        return parse_datetime(self.meta['updated_at']) if self.meta['updated_at'] else None
+
+    def embed(self, text):
+        """Unit query vector for text, None if none of its words are indexed"""
+        rows = [self.word_rows[word] for word in set(words(text)) if word in self.word_rows]
+        if not rows:
+            return None
+        vector = self.idf[rows] @ self.word_vectors[rows]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def search(self, text, limit=RESULTS):
+        """[(book id, score)] of the books closest to text, best first"""
+        vector = self.embed(text)
+        if vector is None or not len(self.book_ids):
+            return []
+        scores = self.book_vectors @ vector.astype(np.float32)
+        if limit < len(scores):
+            top = np.argpartition(-scores, limit)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = top[scores[top] >= MIN_SCORE]
+        return list(zip(self.book_ids[top].tolist(), scores[top].tolist()))
+
+
+_current = (None, None)  # (meta.json mtime, SemanticIndex) of this process
+
+
+def get_index():
+    """This process's SemanticIndex, reopened when a build replaces meta.json"""
+    global _current
+    try:
+        mtime = os.stat(_path(META_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _current[0] != mtime:
+        _current = (mtime, SemanticIndex.open())
+    return _current[1]
+
+
+def semantic_search(queryset, value, ranked=False):
+    """
+    Filter a Book queryset to the books closest in meaning to value, best
+    first with ranked=True. Falls back to the keyword search until the
+    index has been built.
+    """
+    index = get_index()
+    if index is None:
+        return search_books(queryset, value, ranked=ranked)
+    book_ids = [book_id for book_id, _ in index.search(value)]
+    queryset = queryset.filter(pk__in=book_ids)
+    if ranked and book_ids:
+        queryset = queryset.order_by(Case(
+            *[When(pk=book_id, then=position) for position, book_id in enumerate(book_ids)],
+            output_field=IntegerField(),
+        ))
+    return queryset
+
+
+# Offline build
+
+def _load_pipeline():
+    import spacy
+
+    nlp = spacy.load(settings.SEMANTIC_SEARCH_MODEL)
+    # Only the token vectors are needed (or the static vectors, in md/lg pipelines)
+    nlp.select_pipes(enable=[name for name in ('tok2vec',) if name in nlp.pipe_names])
+    return nlp
+
+
+def _embed_words(nlp, new_words):
+    vectors = np.zeros((len(new_words), nlp.vocab.vectors_length or _tensor_width(nlp)), dtype=np.float32)
+    for row, doc in enumerate(nlp.pipe(new_words, batch_size=1000)):
+        vectors[row] = doc.vector
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+def _tensor_width(nlp):
+    return nlp('library').vector.shape[0]
+
+
+def _book_words(book_ids):
+    """{book id: (title words, other words)} for book_ids"""
+    found = {}
+    for start in range(0, len(book_ids), FETCH_CHUNK_SIZE):
+        chunk = book_ids[start:start + FETCH_CHUNK_SIZE]
+        for pk, title, description, category in Book.objects.filter(pk__in=chunk).values_list(
+            'pk', 'title', 'description', 'category__name'
+        ):
+            found[pk] = (words(title), words(f'{description} {category or ""}'))
+    return found
+
+
+def _write(array, name, generation):
+    filename = f'{name}.{generation}.npy'
+    np.save(_path(filename), array)
+    return filename
+
+
+def build_index(full=False):
+    """
+    Bring the index up to date with the books table. Returns a dict with
+    how many books were embedded, dropped and indexed in total.
+    """
+    previous = SemanticIndex.open()
+    index = previous
+    if full or (index and index.meta['model'] != settings.SEMANTIC_SEARCH_MODEL):
+        index = None
+    started = timezone.now()
+    current = dict(Book.objects.values_list('pk', 'updated_at'))
+
+    if index:
+        watermark = index.updated_at
+        indexed = index.book_ids.tolist()
+        known = set(indexed)
+        changed = [
+            pk for pk, updated_at in current.items()
+            if pk not in known or watermark is None or updated_at > watermark
+        ]
+        unchanged = current.keys() - set(changed)
+        keep = np.array([pk in unchanged for pk in indexed], dtype=bool)
+        dropped = len(known - current.keys())
+        vocabulary, word_vectors, idf = list(index.words), np.asarray(index.word_vectors), np.asarray(index.idf)
+        if not changed and not dropped:
+            return {'embedded': 0, 'dropped': 0, 'books': len(indexed)}
+    else:
+        changed, keep, dropped = list(current), None, 0
+        vocabulary, word_vectors, idf = [], None, np.zeros(0, dtype=np.float32)
+
+    book_words = _book_words(changed)
+    changed = list(book_words)  # Deleted while we were reading
+    if word_vectors is None and not book_words:
+        word_vectors = np.zeros((0, 0), dtype=np.float32)  # No books at all
+    new_vectors = np.zeros((0, word_vectors.shape[1] if word_vectors is not None else 0), dtype=np.float32)
+    if book_words:
+        nlp = _load_pipeline()
+        stop_words = nlp.Defaults.stop_words
+        word_rows = {word: row for row, word in enumerate(vocabulary)}
+        new_words = sorted({
+            word for title, other in book_words.values() for word in (*title, *other)
+            if word not in word_rows and word not in stop_words
+        })
+        vectors = _embed_words(nlp, new_words)
+        word_vectors = vectors if word_vectors is None else np.vstack([word_vectors, vectors])
+        for word in new_words:
+            word_rows[word] = len(vocabulary)
+            vocabulary.append(word)
+
+        document_count = len(current)
+        if index:
+            # Known words keep their weight until the next --full build, new ones are rare
+            idf = np.concatenate([idf, np.full(len(new_words), math.log(1 + document_count) + 1, dtype=np.float32)])
+        else:
+            frequency = np.zeros(len(vocabulary), dtype=np.float64)
+            for title, other in book_words.values():
+                frequency[[word_rows[word] for word in set(title + other) if word in word_rows]] += 1
+            idf = (np.log((1 + document_count) / (1 + frequency)) + 1).astype(np.float32)
+
+        # Books x words weights, times the word vectors, gives every book's vector at once
+        rows, columns, weights = [], [], []
+        for row, (title, other) in enumerate(book_words.values()):
+            counts = {}
+            for word in other:
+                counts[word] = 1.0
+            for word in title:
+                counts[word] = TITLE_WEIGHT
+            for word, weight in counts.items():
+                if word in word_rows:
+                    rows.append(row)
+                    columns.append(word_rows[word])
+                    weights.append(weight * idf[word_rows[word]])
+        weight_matrix = sparse.csr_matrix((weights, (rows, columns)), shape=(len(book_words), len(vocabulary)))
+        new_vectors = np.asarray(weight_matrix @ word_vectors, dtype=np.float32)
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        new_vectors = np.divide(new_vectors, norms, out=np.zeros_like(new_vectors), where=norms > 0)
+
+    if index:
+        book_ids = np.concatenate([np.asarray(index.book_ids)[keep], np.array(changed, dtype=np.int64)])
+        book_vectors = np.vstack([np.asarray(index.book_vectors)[keep], new_vectors])
+    else:
+        book_ids, book_vectors = np.array(changed, dtype=np.int64), new_vectors
+
+    os.makedirs(settings.SEMANTIC_INDEX_DIR, exist_ok=True)
+    # Never the files of an index that processes may still have mapped
+    generation = previous.meta['generation'] + 1 if previous else 1
+    with open(_path(f'words.{generation}.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocabulary, f)
+    meta = {
+        'model': settings.SEMANTIC_SEARCH_MODEL,
+        'generation': generation,
+        # Books saved while this build ran are picked up by the next one
+        'updated_at': started.isoformat(),
+        'books': len(book_ids),
+        'words': len(vocabulary),
+        'files': {
+            'book_ids': _write(book_ids, 'book_ids', generation),
+            'book_vectors': _write(book_vectors, 'book_vectors', generation),
+            'word_vectors': _write(word_vectors, 'word_vectors', generation),
+            'idf': _write(idf, 'idf', generation),
+            'words': f'words.{generation}.json',
+        },
+    }
+    with open(_path(f'{META_FILE}.part'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(_path(f'{META_FILE}.part'), _path(META_FILE))
+    _remove_old_generations(generation)
+    return {'embedded': len(changed), 'dropped': dropped, 'books': len(book_ids)}
+
+
+def _remove_old_generations(generation):
+    # Processes that still have the old files mapped keep reading them until they reopen
+    for filename in os.listdir(settings.SEMANTIC_INDEX_DIR):
+        parts = filename.split('.')
+        if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) < generation:
+            os.remove(_path(filename))
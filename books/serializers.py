@@ -0,0 +1,68 @@
+# books/serializers.py
+
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from .models import Book, Category
+
+
+class SparseFieldsMixin:
+    """Serializer that only outputs the field names passed as fields=[...]"""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class BookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category_name = serializers.CharField(source='category.name', default=None, read_only=True)
+    cover = serializers.SerializerMethodField()
+
+    # API field: the model columns it reads, for .only()
+    COLUMNS = {
+        'category': ['category_id'],
+        'category_name': ['category__name'],
+        'cover': ['cover_image', 'cover_renditions'],
+    }
+
+    class Meta:
+        model = Book
+        fields = [
+            'id', 'title', 'author', 'isbn', 'publisher', 'category', 'category_name',
+            'publication_date', 'total_copies', 'available_copies', 'cover',
+            'description', 'created_at', 'updated_at',
+        ]
+
+    def get_cover(self, book):
+        """URLs of the cover renditions by size, or {'original': url} for covers without them"""
+        if not book.cover_image:
+            return None
+        request = self.context.get('request')
+        url = request.build_absolute_uri if request else str
+        sizes = (book.cover_renditions or {}).get('sizes')
+        if not sizes:
+            return {'original': url(book.cover_image.url)}
+        return {
+            size: {
+                'width': rendition['width'],
+                'height': rendition['height'],
+                'webp': url(default_storage.url(rendition['webp'])),
+                'jpg': url(default_storage.url(rendition['jpg'])),
+            }
+            for size, rendition in sizes.items()
+        }
+
+    @classmethod
+    def columns(cls, fields):
+        return [column for name in fields for column in cls.COLUMNS.get(name, [name])]
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    book_count = serializers.IntegerField(read_only=True)
+    available_book_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'description', 'book_count', 'available_book_count']
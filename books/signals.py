@@ -0,0 +1,55 @@
+# books/signals.py
+
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import invalidate_catalog
+from .covers import renditions_are_current, update_renditions
+from .models import Book, BookPopularity, Category
+from .search import SEARCH_FIELDS, index_book, unindex_book
+
+
+@receiver(post_save, sender=Book)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    # Copy count updates from borrows/returns don't touch the indexed columns
+    if update_fields and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    index_book(instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_book(instance.pk)
+
+
+@receiver(post_save, sender=Book)
+def create_popularity_counters(sender, instance, created, **kwargs):
+    if created:
+        BookPopularity.objects.get_or_create(book=instance)
+
+
+@receiver(post_save, sender=Book)
+def build_cover_renditions(sender, instance, update_fields=None, **kwargs):
+    # Runs before refresh_catalog_cache, so cached pages pick up the new renditions
+    if update_fields and 'cover_image' not in update_fields:
+        return
+    if not renditions_are_current(instance):
+        update_renditions(instance)
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_books(sender, instance, created=False, **kwargs):
+    # The semantic index embeds the category name but only re-embeds books
+    # whose updated_at moved. On delete this runs before the books lose the category.
+    if not created:
+        Book.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def refresh_catalog_cache(sender, **kwargs):
+    invalidate_catalog()
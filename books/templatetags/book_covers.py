@@ -0,0 +1,46 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+
+@register.simple_tag
+def cover_image(book, size='card', sizes=None, **attrs):
+    """
+    <picture> for a book cover: WebP and JPEG srcsets of every rendition,
+    with the `size` rendition as the fallback src. `sizes` is the width the
+    image is laid out at (defaults to the rendition's width), any other
+    keyword becomes an <img> attribute, e.g.
+
+        {% cover_image book 'thumb' sizes='48px' class='h-full w-full object-cover' alt=book.title %}
+
+    Covers without renditions are rendered as the original file.
+    """
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    renditions = (book.cover_renditions or {}).get('sizes') or {}
+    if size not in renditions:
+        return format_html('<img src="{}"{}>', book.cover_image.url, _attributes(attrs))
+
+    def srcset(ext):
+        return ', '.join(
+            f"{default_storage.url(rendition[ext])} {rendition['width']}w"
+            for rendition in sorted(renditions.values(), key=lambda r: r['width'])
+        )
+
+    fallback = renditions[size]
+    sizes = sizes or f"{fallback['width']}px"
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}"{}>'
+        '</picture>',
+        srcset('webp'), sizes,
+        default_storage.url(fallback['jpg']), srcset('jpg'), sizes,
+        fallback['width'], fallback['height'], _attributes(attrs),
+    )
+
+
+def _attributes(attrs):
+    return format_html_join('', ' {}="{}"', attrs.items())
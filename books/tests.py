@@ -1,3 +1,215 @@
-from django.test import TestCase
+import tempfile
+import zlib
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User
+from . import semantic
+from .cache import catalog_generation
+from .models import Book, BookPopularity, Category
+from .search import search_books
+
+# The tests run in one process, so their locmem cache stands in for a shared one
+@mock.patch('books.api.is_shared', return_value=True)
+class CatalogETagTests(TestCase):
+    def setUp(self):
+        Book.objects.create(title='Tagged', author='A', isbn='E0001')
+        self.url = reverse('api-book-list', kwargs={'version': 'v1'})
+
+    def test_unchanged_catalog_is_not_modified(self, is_shared):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_catalog_change_gives_a_new_etag(self, is_shared):
+        etag = self.client.get(self.url)['ETag']
+        Book.objects.create(title='Added', author='A', isbn='E0002')
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_no_etag_with_a_per_process_cache(self, is_shared):
+        is_shared.return_value = False
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+
+class CatalogGenerationTests(TestCase):
+    def assertBumps(self, change):
+        generation = catalog_generation()
+        change()
+        self.assertNotEqual(catalog_generation(), generation)
+
+    def test_book_save_and_delete(self):
+        book = Book.objects.create(title='Generation', author='A', isbn='G0001')
+        book.title = 'Renamed'
+        self.assertBumps(book.save)
+        self.assertBumps(book.delete)
+
+    def test_book_create(self):
+        self.assertBumps(lambda: Book.objects.create(title='Generation', author='A', isbn='G0002'))
+
+    def test_category_save_and_delete(self):
+        category = Category.objects.create(name='Generation')
+        category.name = 'Renamed'
+        self.assertBumps(category.save)
+        self.assertBumps(category.delete)
+
+
+class PopularBooksTests(TestCase):
+    def test_ties_go_to_the_newest_book(self):
+        books = [Book.objects.create(title=f'Book {i}', author='A', isbn=f'P{i:04}') for i in range(4)]
+        for book, total in zip(books, [3, 5, 3, 3]):
+            BookPopularity.objects.update_or_create(book=book, defaults={'total_borrows': total})
+        self.assertEqual(list(Book.objects.popular()), [books[1], books[3], books[2], books[0]])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+    def test_popular_is_read_in_index_order(self):
+        sql, params = Book.objects.popular()[:5].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        self.assertTrue(any('books_pop_total_idx' in step for step in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+
+
+class BookImportUploadTests(TestCase):
+    feed = b'title,author,isbn,total_copies\nFirst,A,I0001,2\nSecond,B,I0002,1\nThird,C,I0003,1\n'
+
+    def setUp(self):
+        librarian = User.objects.create_user(
+            username='librarian', email='librarian@example.com', university_id='librarian', role=User.Role.LIBRARIAN
+        )
+        self.client.force_login(librarian)
+
+    def upload(self, content=None):
+        return self.client.post(reverse('book-import'), {'file': SimpleUploadedFile('feed.csv', content or self.feed)})
+
+    def test_feed_is_imported(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 3)
+        self.assertEqual(Book.objects.filter(isbn__startswith='I').count(), 3)
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_feed_spooled_to_disk_is_imported(self):
+        self.upload()
+        self.assertEqual(Book.objects.filter(isbn__startswith='I').count(), 3)
+
+    @mock.patch('books.forms.MAX_UPLOAD_ROWS', 2)
+    def test_too_many_rows_are_refused(self):
+        response = self.upload()
+        self.assertIn('manage.py import_books', response.context['form'].errors['file'][0])
+        self.assertFalse(Book.objects.filter(isbn__startswith='I').exists())
+
+    @mock.patch('books.forms.MAX_UPLOAD_SIZE', 20)
+    def test_too_large_file_is_refused(self):
+        response = self.upload()
+        self.assertTrue(response.context['form'].errors['file'])
+        self.assertFalse(Book.objects.filter(isbn__startswith='I').exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Ranks the FTS5 index')
+class RankedSearchTests(TestCase):
+    def setUp(self):
+        self.books = [
+            Book.objects.create(title='Gardening', author='Rose Field', isbn='S0001'),
+            Book.objects.create(title='Rose Rose Rose', author='Rose', isbn='S0002'),
+            Book.objects.create(title='Roses of the world', author='B', isbn='S0003'),
+            Book.objects.create(title='Cooking', author='C', isbn='S0004'),
+        ]
+
+    def test_ranked_matches_the_same_books_best_first(self):
+        ranked = list(search_books(Book.objects.all(), 'rose', ranked=True))
+        self.assertEqual(set(ranked), set(search_books(Book.objects.all(), 'rose')))
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(ranked[0], self.books[1])
+        self.assertEqual([book.search_rank for book in ranked], sorted(book.search_rank for book in ranked))
+
+    def test_ranked_results_can_be_filtered_and_counted(self):
+        ranked = search_books(Book.objects.filter(author='B'), 'rose', ranked=True)
+        self.assertEqual(ranked.count(), 1)
+
+
+class FakeVocab:
+    vectors_length = 16
+
+
+class FakeDoc:
+    def __init__(self, word):
+        # The same word always gets the same vector, different words nearly orthogonal ones
+        self.vector = np.random.default_rng(zlib.crc32(word.encode())).standard_normal(FakeVocab.vectors_length)
+
+
+class FakePipeline:
+    """Stands in for the spaCy pipeline, which isn't installed with the test requirements"""
+
+    class Defaults:
+        stop_words = {'the', 'of', 'and'}
+
+    vocab = FakeVocab()
+
+    def pipe(self, texts, batch_size=None):
+        return (FakeDoc(text) for text in texts)
+
+
+@mock.patch('books.semantic._load_pipeline', return_value=FakePipeline())
+class SemanticIndexTests(TestCase):
+    def setUp(self):
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        override = override_settings(SEMANTIC_INDEX_DIR=index_dir.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.science = Category.objects.create(name='Astronomy')
+        self.garden = Book.objects.create(title='Gardening for beginners', author='A', isbn='M0001',
+                                          description='Roses and tulips')
+        self.stars = Book.objects.create(title='Telescopes', author='B', isbn='M0002', category=self.science)
+        self.cooking = Book.objects.create(title='Cooking', author='C', isbn='M0003', description='Bread')
+
+    def search(self, text):
+        return [book_id for book_id, _ in semantic.SemanticIndex.open().search(text)]
+
+    def test_full_build(self, pipeline):
+        self.assertEqual(semantic.build_index(full=True), {'embedded': 3, 'dropped': 0, 'books': 3})
+        self.assertEqual(self.search('tulips')[:1], [self.garden.pk])
+        self.assertEqual(self.search('astronomy')[:1], [self.stars.pk])
+        self.assertEqual(self.search('words nobody used'), [])
+
+    def test_incremental_build_only_embeds_changed_books(self, pipeline):
+        semantic.build_index()
+        self.assertEqual(semantic.build_index(), {'embedded': 0, 'dropped': 0, 'books': 3})
+        self.cooking.description = 'Sourdough'
+        self.cooking.save()
+        self.assertEqual(semantic.build_index(), {'embedded': 1, 'dropped': 0, 'books': 3})
+        self.assertEqual(self.search('sourdough')[:1], [self.cooking.pk])
+        self.assertEqual(self.search('tulips')[:1], [self.garden.pk])
+
+    def test_renamed_category_is_embedded_again(self, pipeline):
+        semantic.build_index()
+        self.science.name = 'Cosmology'
+        self.science.save()
+        self.assertEqual(semantic.build_index()['embedded'], 1)
+        self.assertEqual(self.search('cosmology')[:1], [self.stars.pk])
+
+    def test_deleted_category_is_embedded_again(self, pipeline):
+        semantic.build_index()
+        self.science.delete()
+        self.assertEqual(semantic.build_index()['embedded'], 1)
+        self.assertNotIn(self.stars.pk, self.search('astronomy'))
+
+    def test_deleted_book_is_dropped(self, pipeline):
+        semantic.build_index()
+        garden_pk = self.garden.pk
+        self.garden.delete()
+        self.assertEqual(semantic.build_index(), {'embedded': 0, 'dropped': 1, 'books': 2})
+        self.assertNotIn(garden_pk, semantic.SemanticIndex.open().book_ids.tolist())
+        self.assertNotIn(garden_pk, self.search('tulips'))
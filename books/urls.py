@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    BookListView, BookDetailView, BookCreateView, BookUpdateView, BookDeleteView,
+    BookListView, BookDetailView, BookCreateView, BookUpdateView, BookDeleteView, BookImportView,
     CategoryListView, CategoryDetailView, CategoryCreateView, CategoryUpdateView, CategoryDeleteView
 )
 
@@ -11,6 +11,7 @@ urlpatterns = [
     path('new/', BookCreateView.as_view(), name='book-create'),
     path('<int:pk>/update/', BookUpdateView.as_view(), name='book-update'),
     path('<int:pk>/delete/', BookDeleteView.as_view(), name='book-delete'),
+    path('import/', BookImportView.as_view(), name='book-import'),
     
     # Category URLs
     path('categories/', CategoryListView.as_view(), name='category-list'),
@@ -1,14 +1,17 @@
 # books/views.py
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django_filters.views import FilterView
 from .models import Book, Category
-from .forms import BookForm, CategoryForm, BookSearchForm
+from .forms import BookForm, CategoryForm, BookSearchForm, BookImportForm
 from .filters import BookFilter
+from .importer import detect_format, import_books, read_rows
+from .cache import CATALOG_CACHE_TIMEOUT, cached_catalog, catalog_generation
+from .recommendations import recommendations_for
 from transactions.models import Borrow
 
 from django_filters.views import FilterView
@@ -37,7 +40,7 @@ class BookListView(FilterView):
         # Apply sorting
         sort = self.request.GET.get('sort')
         if sort == 'popular':
-            qs = qs.annotate(num_borrows=Count('borrows')).order_by('-num_borrows')
+            qs = qs.popular()
         elif sort in ['title', '-title', '-created_at']:
             qs = qs.order_by(sort)
         else:
@@ -48,8 +51,11 @@ class BookListView(FilterView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_form'] = BookSearchForm(self.request.GET or None)
-        context['categories'] = Category.objects.all()
+        context['categories'] = cached_catalog('categories', lambda: list(Category.objects.order_by('name')))
         context['current_view'] = self.request.GET.get('view', 'grid')  # Default to grid
+        # vary_on/timeout for the {% cache %} grid fragments
+        context['catalog_generation'] = catalog_generation()
+        context['catalog_cache_timeout'] = CATALOG_CACHE_TIMEOUT
         
         # Add user's borrowed books information if user is authenticated
         if self.request.user.is_authenticated:
@@ -65,10 +71,20 @@ class BookDetailView(DetailView):
     model = Book
     template_name = 'books/book_detail.html'
 
+    def get_object(self, queryset=None):
+        get_object = super().get_object
+        # A missing book raises Http404 before anything is stored
+        return cached_catalog(
+            f"book:{self.kwargs['pk']}", lambda: get_object(Book.objects.select_related('category'))
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
             context['is_borrowed'] = self.object.is_borrowed_by_user(self.request.user)
+        context['recommendations'] = cached_catalog(
+            f"book:{self.object.pk}:recommendations", lambda: recommendations_for(self.object.pk)
+        )
         return context
 class BookCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Book
@@ -120,15 +136,58 @@ class BookDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
+class BookImportView(LoginRequiredMixin, UserPassesTestMixin, FormView):
+    form_class = BookImportForm
+    template_name = 'books/book_import.html'
+
+    def test_func(self):
+        return self.request.user.is_admin() or self.request.user.is_librarian()
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        # Uploads over FILE_UPLOAD_MAX_MEMORY_SIZE are already on disk, read_rows streams them from there
+        result = import_books(read_rows(upload.open('rb'), detect_format(upload.name)))
+        if result.created or result.updated:
+            messages.success(
+                self.request,
+                f'Imported {result.created + result.updated} books '
+                f'({result.created} new, {result.updated} updated) in {result.elapsed:.1f}s.'
+            )
+        return self.render_to_response(self.get_context_data(form=form, result=result))
+
+
 class CategoryListView(ListView):
     model = Category
     template_name = 'books/category_list.html'
     context_object_name = 'categories'
 
+    def get_queryset(self):
+        return cached_catalog('category-list', lambda: list(
+            Category.objects.with_book_counts().with_preview_books(3).order_by('name')
+        ))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Summary tiles come from the annotated rows, no extra queries
+        categories = context['categories']
+        total_books = sum(category.book_count for category in categories)
+        context['total_books'] = total_books
+        context['avg_books_per_category'] = round(total_books / len(categories), 1) if categories else 0
+        context['most_popular_category'] = max(categories, key=lambda category: category.book_count, default=None)
+        return context
+
 class CategoryDetailView(DetailView):
     model = Category
     template_name = 'books/category_detail.html'
 
+    def get_queryset(self):
+        return Category.objects.with_book_counts()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['books'] = self.object.book_set.order_by('title')
+        return context
+
 class CategoryCreateView(LoginRequiredMixin, UserPassesTestMixin, CreateView):
     model = Category
     form_class = CategoryForm
@@ -160,6 +219,9 @@ class CategoryDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
     model = Category
     template_name = 'books/category_confirm_delete.html'
     success_url = reverse_lazy('category-list')
+
+    def get_queryset(self):
+        return Category.objects.with_book_counts().with_preview_books(5)
     
     def test_func(self):
         return self.request.user.is_admin or self.request.user.is_librarian
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from dashboard.models import DashboardSnapshot
+
+class Command(BaseCommand):
+    help = 'Recompute the staff dashboard totals (run periodically, e.g. every minute from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running and refresh every --interval seconds')
+        parser.add_argument('--interval', type=float, default=60)
+
+    def handle(self, *args, **options):
+        while True:
+            snapshot = DashboardSnapshot.refresh()
+            self.stdout.write(
+                f"Snapshot refreshed at {snapshot.refreshed_at:%Y-%m-%d %H:%M:%S}: "
+                f"{snapshot.total_books} books, {snapshot.total_borrows} borrows, "
+                f"{snapshot.total_reservations} reservations"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
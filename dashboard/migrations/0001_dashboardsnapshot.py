@@ -0,0 +1,29 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_books', models.PositiveIntegerField(default=0)),
+                ('popular_books', models.PositiveIntegerField(default=0)),
+                ('total_borrows', models.PositiveIntegerField(default=0)),
+                ('active_borrows', models.PositiveIntegerField(default=0)),
+                ('overdue_borrows', models.PositiveIntegerField(default=0)),
+                ('total_fines', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_reservations', models.PositiveIntegerField(default=0)),
+                ('pending_reservations', models.PositiveIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
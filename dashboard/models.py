@@ -1,3 +1,69 @@
+from datetime import timedelta
+
 from django.db import models
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+SNAPSHOT_MAX_AGE = timedelta(minutes=5)  # read-side fallback when the refresh job isn't running
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Library-wide totals for the staff dashboard. There is a single row,
+    recomputed by the refresh_dashboard_snapshot command; refreshed_at says
+    how old the numbers are.
+    """
+    total_books = models.PositiveIntegerField(default=0)
+    popular_books = models.PositiveIntegerField(default=0)
+    total_borrows = models.PositiveIntegerField(default=0)
+    active_borrows = models.PositiveIntegerField(default=0)
+    overdue_borrows = models.PositiveIntegerField(default=0)
+    total_fines = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_reservations = models.PositiveIntegerField(default=0)
+    pending_reservations = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Dashboard snapshot at {self.refreshed_at}"
+
+    @property
+    def reservation_percentage(self):
+        if not self.total_reservations:
+            return 0
+        return round(self.pending_reservations / self.total_reservations * 100)
+
+    @classmethod
+    def current(cls, max_age=SNAPSHOT_MAX_AGE):
+        """The snapshot in one query, recomputed first if it's missing or older than max_age"""
+        snapshot = cls.objects.filter(pk=1).first()
+        if snapshot is None or snapshot.refreshed_at < timezone.now() - max_age:
+            snapshot = cls.refresh()
+        return snapshot
+
+    @classmethod
+    def refresh(cls):
+        """Recompute every total (one aggregate query per table) and store it"""
+        from books.models import Book, BookPopularity
+        from transactions.models import Borrow, Fine, Reservation
 
-# Create your models here.
+        borrows = Borrow.objects.aggregate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_returned=False)),
+            overdue=Count('id', filter=Q(is_returned=False, due_date__lt=timezone.now().date())),
+        )
+        reservations = Reservation.objects.aggregate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(status='PENDING')),
+        )
+        snapshot, _ = cls.objects.update_or_create(pk=1, defaults={
+            'total_books': Book.objects.count(),
+            'popular_books': BookPopularity.objects.count(),
+            'total_borrows': borrows['total'],
+            'active_borrows': borrows['active'],
+            'overdue_borrows': borrows['overdue'],
+            'total_fines': Fine.objects.aggregate(total=Sum('amount', default=0))['total'],
+            'total_reservations': reservations['total'],
+            'pending_reservations': reservations['pending'],
+            'refreshed_at': timezone.now(),
+        })
+        return snapshot
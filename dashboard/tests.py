@@ -1,3 +1,106 @@
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from books.models import Book
+from transactions.models import Borrow, Reservation
+from .models import DashboardSnapshot
+from .views import _staff_lists
+
+
+def make_user(name, role=User.Role.STUDENT):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', university_id=name, role=role)
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard lists cost the same number of queries however many rows they show"""
+
+    def setUp(self):
+        self.librarian = make_user('librarian', User.Role.LIBRARIAN)
+        self.student = make_user('student')
+        today = timezone.now().date()
+        for i in range(12):
+            book = Book.objects.create(title=f'Book {i}', author='A', isbn=f'D{i:04}', total_copies=2)
+            # Every other borrow is overdue
+            Borrow.objects.create(user=self.student, book=book, due_date=today + timedelta(days=7 if i % 2 else -7))
+            Reservation.objects.create(user=self.student, book=book)
+        DashboardSnapshot.refresh()
+
+    def assertQueriesPerPage(self, user, sections, expected_queries, page_sizes=(3, 10)):
+        self.client.force_login(user)
+        for page_size in page_sizes:
+            with self.subTest(user=user.username, page_size=page_size):
+                cache.clear()
+                with self.assertNumQueries(expected_queries):
+                    response = self.client.get(reverse('dashboard'), {section: page_size for section in sections})
+                self.assertEqual(response.status_code, 200)
+
+    def test_staff_dashboard(self):
+        self.assertQueriesPerPage(
+            self.librarian, ['recent_borrows', 'overdue_borrows', 'popular_books', 'recent_reservations'], 7
+        )
+
+    def test_user_dashboard(self):
+        self.assertQueriesPerPage(self.student, ['user_borrows', 'user_reservations'], 9)
+
+    def test_load_more(self):
+        self.client.force_login(self.librarian)
+        for offset in (0, 5):
+            with self.subTest(offset=offset):
+                with self.assertNumQueries(3):
+                    response = self.client.get(
+                        reverse('dashboard'), {'section': 'recent_borrows', 'offset': offset},
+                        headers={'X-Requested-With': 'XMLHttpRequest'},
+                    )
+                self.assertEqual(response.status_code, 200)
+
+
+class DashboardListTests(TestCase):
+    def setUp(self):
+        self.librarian = make_user('librarian', User.Role.LIBRARIAN)
+        self.student = make_user('student')
+        self.client.force_login(self.librarian)
+        book = Book.objects.create(title='Book', author='A', isbn='T0001', total_copies=10)
+        # Same issue and due date, only the pk tells them apart
+        self.borrows = [
+            Borrow.objects.create(user=self.student, book=book, due_date=timezone.now().date() - timedelta(days=1))
+            for _ in range(7)
+        ]
+
+    def load_more(self, section, offset):
+        return self.client.get(
+            reverse('dashboard'), {'section': section, 'offset': offset},
+            headers={'X-Requested-With': 'XMLHttpRequest'},
+        )
+
+    def test_ties_are_ordered_by_pk(self):
+        lists = _staff_lists()
+        newest_first = [borrow.pk for borrow in reversed(self.borrows)]
+        self.assertEqual([borrow.pk for borrow in lists['recent_borrows']], newest_first)
+        self.assertEqual([borrow.pk for borrow in lists['overdue_borrows']], newest_first[::-1])
+
+    def test_load_more_walks_the_whole_list(self):
+        first, second = self.load_more('recent_borrows', 0).json(), self.load_more('recent_borrows', 5).json()
+        self.assertTrue(first['has_more'])
+        self.assertFalse(second['has_more'])
+        self.assertEqual(second['next_offset'], 7)
+
+    def test_bad_offset_starts_from_the_top(self):
+        response = self.load_more('recent_borrows', 'abc')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['next_offset'], 5)
+
+    def test_section_counts_are_clamped(self):
+        for value, expected in [('-3', 1), ('0', 1), ('abc', 5), ('100000', 100)]:
+            with self.subTest(value):
+                response = self.client.get(reverse('dashboard'), {'recent_borrows': value})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['recent_borrows_count'], expected)
+                self.assertEqual(len(response.context['recent_borrows']), min(expected, len(self.borrows)))
 
-# Create your tests here.
+    def test_negative_offset_starts_from_the_top(self):
+        self.assertEqual(self.load_more('recent_borrows', -5).json()['next_offset'], 5)
@@ -1,80 +1,125 @@
-from django.db.models import Sum, Count, Case, When, IntegerField
+from django.db.models import F, Sum, Case, When, IntegerField
+from django.http import Http404, JsonResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render
 from books.models import Book
-from transactions.models import Borrow, Fine, Reservation
+from transactions.models import Borrow, Reservation
+from .models import DashboardSnapshot
+
+ITEMS_PER_PAGE = 5
+MAX_ITEMS = 100  # rows per list on a full page load
+
+
+def _staff_lists():
+    """The ordered (lazy, unsliced) querysets behind the staff dashboard lists"""
+    return {
+        'recent_borrows': Borrow.objects.select_related('book', 'user').order_by('-issue_date', '-pk'),
+        'overdue_borrows': Borrow.objects.select_related('book', 'user').filter(
+            is_returned=False,
+            due_date__lt=timezone.now().date()
+        ).order_by('due_date', 'pk'),
+        'popular_books': Book.objects.popular(),
+        'recent_reservations': Reservation.objects.select_related('book', 'user').order_by('-reservation_date', '-pk'),
+    }
+
+
+def _user_lists(user):
+    """The ordered (lazy, unsliced) querysets behind the student/faculty dashboard lists"""
+    return {
+        # Active borrows first by due date, then returned ones most recent first,
+        # ordered (and later sliced) in SQL rather than concatenated in Python
+        'user_borrows': user.borrows.select_related('book').order_by(
+            'is_returned',
+            Case(When(is_returned=False, then='due_date')),
+            F('return_date').desc(nulls_last=True),
+            '-pk'
+        ),
+        'user_reservations': user.reservations.select_related('book').order_by(
+            Case(
+                When(status='PENDING', then=0),
+                When(status='AVAILABLE', then=1),
+                When(status='COMPLETED', then=2),
+                When(status='CANCELLED', then=3),
+                default=4,
+                output_field=IntegerField(),
+            ),
+            '-reservation_date'
+        ),
+    }
+
+
+def _int_param(request, name, default, minimum=1, maximum=MAX_ITEMS):
+    """
+    GET parameter name as an int between minimum and maximum (None for no
+    limit), default when it is missing or not a number
+    """
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        return default
+    value = max(value, minimum)
+    return min(value, maximum) if maximum is not None else value
+
+
+def _load_more(request, lists):
+    """AJAX "load more": render only the next slice of one list, no totals"""
+    section = request.GET.get('section')
+    if section not in lists:
+        raise Http404
+    offset = _int_param(request, 'offset', 0, minimum=0, maximum=None)
+    # One extra row tells us whether there is another slice after this one
+    items = list(lists[section][offset:offset + ITEMS_PER_PAGE + 1])
+    has_more = len(items) > ITEMS_PER_PAGE
+    items = items[:ITEMS_PER_PAGE]
+    html = render_to_string(f'dashboard/partials/{section}.html', {section: items}, request=request)
+    return JsonResponse({'html': html, 'next_offset': offset + len(items), 'has_more': has_more})
+
 
 @login_required
 def dashboard(request):
     user = request.user
-    ITEMS_PER_PAGE = 5
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    is_staff = user.role in ['ADMIN', 'LIBRARIAN']
+
+    if is_ajax and 'section' in request.GET:
+        return _load_more(request, _staff_lists() if is_staff else _user_lists(user))
 
     # Get the current display count for each section from request
-    recent_borrows_count = int(request.GET.get('recent_borrows', ITEMS_PER_PAGE))
-    overdue_borrows_count = int(request.GET.get('overdue_borrows', ITEMS_PER_PAGE))
-    popular_books_count = int(request.GET.get('popular_books', ITEMS_PER_PAGE))
-    recent_reservations_count = int(request.GET.get('recent_reservations', ITEMS_PER_PAGE))
-    user_borrows_count = int(request.GET.get('user_borrows', ITEMS_PER_PAGE))
-    user_reservations_count = int(request.GET.get('user_reservations', ITEMS_PER_PAGE))
+    recent_borrows_count = _int_param(request, 'recent_borrows', ITEMS_PER_PAGE)
+    overdue_borrows_count = _int_param(request, 'overdue_borrows', ITEMS_PER_PAGE)
+    popular_books_count = _int_param(request, 'popular_books', ITEMS_PER_PAGE)
+    recent_reservations_count = _int_param(request, 'recent_reservations', ITEMS_PER_PAGE)
+    user_borrows_count = _int_param(request, 'user_borrows', ITEMS_PER_PAGE)
+    user_reservations_count = _int_param(request, 'user_reservations', ITEMS_PER_PAGE)
 
     # Admin & Librarian Dashboard
-    if user.role in ['ADMIN', 'LIBRARIAN']:
-        total_books = Book.objects.count()
-        total_borrows = Borrow.objects.count()
-        total_fines = Fine.objects.aggregate(total=Sum('amount'))['total'] or 0
-        total_reservations = Reservation.objects.count()
-        
-        active_reservations_count = Reservation.objects.filter(
-            status='PENDING'
-        ).count()
-        
-        reservation_percentage = round(
-            (active_reservations_count / total_reservations * 100) 
-            if total_reservations > 0 else 0
-        )
-
-        recent_borrows = Borrow.objects.order_by('-issue_date')
-        recent_borrows_total = recent_borrows.count()
-        recent_borrows = recent_borrows[:recent_borrows_count]
-
-        overdue_borrows = Borrow.objects.filter(
-            is_returned=False,
-            due_date__lt=timezone.now().date()
-        ).order_by('due_date')
-        overdue_borrows_total = overdue_borrows.count()
-        overdue_borrows = overdue_borrows[:overdue_borrows_count]
-
-        popular_books = Book.objects.annotate(
-            borrow_count=Count('borrows')
-        ).order_by('-borrow_count')
-        popular_books_total = popular_books.count()
-        popular_books = popular_books[:popular_books_count]
-
-        recent_reservations = Reservation.objects.order_by('-reservation_date')
-        recent_reservations_total = recent_reservations.count()
-        recent_reservations = recent_reservations[:recent_reservations_count]
+    if is_staff:
+        # Totals come from the snapshot, the lists only fetch what is shown
+        snapshot = DashboardSnapshot.current()
+        lists = _staff_lists()
 
         context = {
-            'total_books': total_books,
-            'total_borrows': total_borrows,
-            'total_fines': total_fines,
-            'total_reservations': total_reservations,
-            'active_borrows_count': Borrow.objects.filter(is_returned=False).count(),
-            'active_reservations_count': active_reservations_count,
-            'reservation_percentage': reservation_percentage,
-            'recent_borrows': recent_borrows,
-            'recent_borrows_total': recent_borrows_total,
+            'snapshot': snapshot,
+            'total_books': snapshot.total_books,
+            'total_borrows': snapshot.total_borrows,
+            'total_fines': snapshot.total_fines,
+            'total_reservations': snapshot.total_reservations,
+            'active_borrows_count': snapshot.active_borrows,
+            'active_reservations_count': snapshot.pending_reservations,
+            'reservation_percentage': snapshot.reservation_percentage,
+            'recent_borrows': list(lists['recent_borrows'][:recent_borrows_count]),
+            'recent_borrows_total': snapshot.total_borrows,
             'recent_borrows_count': recent_borrows_count,
-            'overdue_borrows': overdue_borrows,
-            'overdue_borrows_total': overdue_borrows_total,
+            'overdue_borrows': list(lists['overdue_borrows'][:overdue_borrows_count]),
+            'overdue_borrows_total': snapshot.overdue_borrows,
             'overdue_borrows_count': overdue_borrows_count,
-            'popular_books': popular_books,
-            'popular_books_total': popular_books_total,
+            'popular_books': list(lists['popular_books'][:popular_books_count]),
+            'popular_books_total': snapshot.popular_books,
             'popular_books_count': popular_books_count,
-            'recent_reservations': recent_reservations,
-            'recent_reservations_total': recent_reservations_total,
+            'recent_reservations': list(lists['recent_reservations'][:recent_reservations_count]),
+            'recent_reservations_total': snapshot.total_reservations,
             'recent_reservations_count': recent_reservations_count,
             'ITEMS_PER_PAGE': ITEMS_PER_PAGE,
             'is_ajax': is_ajax,
@@ -82,39 +127,27 @@ def dashboard(request):
 
     # Student & Faculty Dashboard
     else:
-        active_borrows = user.borrows.filter(is_returned=False).order_by('due_date')
-        returned_borrows = user.borrows.filter(is_returned=True).order_by('-return_date')
-        user_borrows = list(active_borrows) + list(returned_borrows)
-        user_borrows_total = len(user_borrows)
-        user_borrows = user_borrows[:user_borrows_count]
-        
-        user_reservations = user.reservations.all().order_by(
-            Case(
-                When(status='PENDING', then=0),
-                When(status='AVAILABLE', then=1),
-                When(status='COMPLETED', then=2),
-                When(status='CANCELLED', then=3),
-                default=4,
-                output_field=IntegerField(),
-            ),
-            '-reservation_date'
-        )
+        lists = _user_lists(user)
+        user_borrows_total = user.borrows.count()
+        user_borrows = list(lists['user_borrows'][:user_borrows_count])
+
+        user_reservations = lists['user_reservations']
         user_reservations_total = user_reservations.count()
-        user_reservations = user_reservations[:user_reservations_count]
-        
+        user_reservations = list(user_reservations[:user_reservations_count])
+
         active_reservations_count = user.reservations.filter(
             status='PENDING'
         ).count()
-        
+
         total_reservations = user_reservations_total
         reservation_percentage = round(
-            (active_reservations_count / total_reservations * 100) 
+            (active_reservations_count / total_reservations * 100)
             if total_reservations > 0 else 0
         )
 
         context = {
-            'active_borrows_count': active_borrows.count(),
-            'total_borrows': user.borrows.count(),
+            'active_borrows_count': user.borrows.filter(is_returned=False).count(),
+            'total_borrows': user_borrows_total,
             'total_reservations': total_reservations,
             'active_reservations_count': active_reservations_count,
             'reservation_percentage': reservation_percentage,
@@ -129,4 +162,4 @@ def dashboard(request):
             'is_ajax': is_ajax,
         }
 
-    return render(request, 'dashboard/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'dashboard/dashboard.html', context)
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from notifications.outbox import send_queued_emails
+
+class Command(BaseCommand):
+    help = 'Send emails waiting in the outbox over one reused mail connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll the outbox')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_queued_emails(batch_size=options['batch_size'])
+            if sent or failed:
+                self.stdout.write(f"Sent {sent} emails, {failed} failed")
+            if not options['loop']:
+                break
+            if not (sent or failed):
+                time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS('Outbox processed'))
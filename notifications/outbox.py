@@ -0,0 +1,119 @@
+# notifications/outbox.py
+
+from datetime import timedelta
+
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = timedelta(minutes=1)  # doubled after every failed attempt
+CLAIM_TIMEOUT = timedelta(minutes=10)  # a crashed worker's batch is retried after this
+
+
+def _outgoing(message):
+    html_body = next(
+        (content for content, mimetype in getattr(message, 'alternatives', []) if mimetype == 'text/html'),
+        ''
+    )
+    return OutgoingEmail(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email,
+        to=list(message.to),
+    )
+
+
+def queue_email(message):
+    """Store an EmailMessage in the outbox instead of sending it during the request"""
+    email = _outgoing(message)
+    email.save()
+    return email
+
+
+def queue_emails(messages):
+    OutgoingEmail.objects.bulk_create([_outgoing(message) for message in messages], batch_size=500)
+
+
+def _retry_later(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = OutgoingEmail.Status.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + RETRY_DELAY * 2 ** (email.attempts - 1)
+    email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+
+def _tracked(emails, attempted, connection):
+    """The emails' messages, recording each email in attempted as the backend reaches it"""
+    for email in emails:
+        attempted.append(email)
+        yield email.to_message(connection)
+
+
+def send_queued_emails(batch_size=100):
+    """
+    Deliver due outbox emails over a single mail connection, the whole
+    batch in one send_messages() call.
+
+    Backends send the messages in order and stop at the first one that
+    raises, so the emails before it were sent and only that one is retried;
+    the rest of the batch goes out in another call. Returns a (sent, failed)
+    tuple. Failed emails are retried with exponential backoff until
+    MAX_ATTEMPTS, then marked FAILED.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True).filter(
+                status=OutgoingEmail.Status.PENDING, next_attempt_at__lte=now
+            ).order_by('next_attempt_at')[:batch_size]
+        )
+        # Claim the batch so a second worker doesn't send it too
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+            next_attempt_at=now + CLAIM_TIMEOUT
+        )
+    if not batch:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for email in batch:
+            _retry_later(email, e)
+        return 0, len(batch)
+
+    sent_ids = []
+    failed = 0
+    remaining = batch
+    try:
+        while remaining:
+            attempted = []
+            try:
+                connection.send_messages(_tracked(remaining, attempted, connection))
+            except Exception as e:
+                if not attempted:
+                    # The backend failed before sending anything, e.g. a dropped connection
+                    for email in remaining:
+                        _retry_later(email, e)
+                    failed += len(remaining)
+                    break
+                sent_ids.extend(email.pk for email in attempted[:-1])
+                _retry_later(attempted[-1], e)
+                failed += 1
+                remaining = remaining[len(attempted):]
+            else:
+                sent_ids.extend(email.pk for email in attempted)
+                remaining = remaining[len(attempted):]
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.filter(pk__in=sent_ids).update(
+        status=OutgoingEmail.Status.SENT, sent_at=timezone.now()
+    )
+    return len(sent_ids), failed
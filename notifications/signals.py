@@ -0,0 +1,19 @@
+# notifications/signals.py
+
+from django.db.models import F
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from accounts.models import User
+from .models import Notification
+
+
+@receiver(pre_delete, sender=Notification)
+def uncount_unread(sender, instance, **kwargs):
+    # Deleting an unread notification (admin, user cascade) must not leave it counted.
+    # Read from the row, not the instance, which may predate a mark_read(); pre_delete
+    # runs in the same transaction as the DELETE.
+    if Notification.objects.filter(pk=instance.pk, is_read=False).exists():
+        User.objects.filter(pk=instance.user_id, unread_notification_count__gt=0).update(
+            unread_notification_count=F('unread_notification_count') - 1
+        )
@@ -1,3 +1,210 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Notification, OutgoingEmail
+from .outbox import CLAIM_TIMEOUT, MAX_ATTEMPTS, RETRY_DELAY, send_queued_emails
+from .utils import create_notifications, mark_all_read, mark_read, notify, notify_many, notify_staff
+
+
+def make_user(name, role=User.Role.STUDENT):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', university_id=name, role=role
+    )
+
+
+class RecordingBackend(EmailBackend):
+    """locmem backend that also records every send_messages() call"""
+    calls = []
+
+    def send_messages(self, messages):
+        messages = list(messages)
+        RecordingBackend.calls.append([message.to[0] for message in messages])
+        return super().send_messages(messages)
+
+
+class FailingBackend(EmailBackend):
+    """locmem backend that refuses mail to anyone at bounce.example.com"""
+
+    def send_messages(self, messages):
+        sent = 0
+        for message in messages:
+            if message.to[0].endswith('@bounce.example.com'):
+                raise OSError('550 mailbox unavailable')
+            sent += super().send_messages([message])
+        return sent
+
+
+class DownBackend(EmailBackend):
+    def open(self):
+        raise OSError('Connection refused')
+
+
+def queue(*recipients, **fields):
+    return [
+        OutgoingEmail.objects.create(subject='Hello', body='Hi', from_email='library@example.com', to=[to], **fields)
+        for to in recipients
+    ]
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        RecordingBackend.calls = []
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.RecordingBackend')
+    def test_batch_goes_out_in_one_call_and_is_marked_sent(self):
+        queue('a@example.com', 'b@example.com', 'c@example.com')
+        self.assertEqual(send_queued_emails(), (3, 0))
+        self.assertEqual(RecordingBackend.calls, [['a@example.com', 'b@example.com', 'c@example.com']])
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.Status.SENT).exists())
+        self.assertFalse(OutgoingEmail.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    def test_only_due_emails_are_claimed(self):
+        due, = queue('due@example.com')
+        later, = queue('later@example.com', next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(send_queued_emails(batch_size=10), (1, 0))
+        later.refresh_from_db()
+        self.assertEqual(later.status, OutgoingEmail.Status.PENDING)
+        self.assertEqual([message.to for message in mail.outbox], [['due@example.com']])
+
+    def test_claimed_emails_are_not_sent_twice(self):
+        queue('a@example.com')
+        # A worker that claims the row and crashes pushes it back by CLAIM_TIMEOUT
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now() + CLAIM_TIMEOUT)
+        self.assertEqual(send_queued_emails(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingBackend')
+    def test_failure_is_retried_with_backoff(self):
+        good_before, bounced, good_after = queue('a@example.com', 'x@bounce.example.com', 'b@example.com')
+        started = timezone.now()
+        self.assertEqual(send_queued_emails(), (2, 1))
+        self.assertEqual([message.to[0] for message in mail.outbox], ['a@example.com', 'b@example.com'])
+        for email in (good_before, good_after):
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutgoingEmail.Status.SENT)
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, OutgoingEmail.Status.PENDING)
+        self.assertEqual(bounced.attempts, 1)
+        self.assertIn('550', bounced.last_error)
+        self.assertGreaterEqual(bounced.next_attempt_at, started + RETRY_DELAY)
+        self.assertLess(bounced.next_attempt_at, started + 2 * RETRY_DELAY)
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingBackend')
+    def test_backoff_doubles_with_every_attempt(self):
+        bounced, = queue('x@bounce.example.com', attempts=2)
+        started = timezone.now()
+        send_queued_emails()
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.attempts, 3)
+        self.assertGreaterEqual(bounced.next_attempt_at, started + RETRY_DELAY * 4)
+        self.assertLess(bounced.next_attempt_at, started + RETRY_DELAY * 5)
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.FailingBackend')
+    def test_gives_up_after_max_attempts(self):
+        bounced, = queue('x@bounce.example.com', attempts=MAX_ATTEMPTS - 1)
+        self.assertEqual(send_queued_emails(), (0, 1))
+        bounced.refresh_from_db()
+        self.assertEqual(bounced.status, OutgoingEmail.Status.FAILED)
+        self.assertEqual(bounced.attempts, MAX_ATTEMPTS)
+
+    @override_settings(EMAIL_BACKEND='notifications.tests.DownBackend')
+    def test_unreachable_server_retries_the_whole_batch(self):
+        queue('a@example.com', 'b@example.com')
+        self.assertEqual(send_queued_emails(), (0, 2))
+        self.assertEqual(list(OutgoingEmail.objects.values_list('attempts', flat=True)), [1, 1])
+
+
+class UnreadCounterTests(TestCase):
+    """unread_notification_count always equals the user's unread rows"""
+
+    def setUp(self):
+        self.user = make_user('reader')
+
+    def assertCounted(self, expected):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.unread_notification_count, expected)
+        self.assertEqual(self.user.notifications.filter(is_read=False).count(), expected)
+
+    def test_create_and_mark_read(self):
+        for message in ('one', 'two', 'three'):
+            notify(self.user, message)
+        self.assertCounted(3)
+        first = self.user.notifications.earliest('pk')
+        mark_read(self.user, first.pk)
+        self.assertCounted(2)
+        # Marking it again doesn't count it twice
+        mark_read(self.user, first.pk)
+        self.assertCounted(2)
+        mark_all_read(self.user)
+        self.assertCounted(0)
+
+    def test_mark_read_ignores_other_users_notifications(self):
+        other = make_user('other')
+        notify(other, 'not yours')
+        mark_read(self.user, other.notifications.get().pk)
+        other.refresh_from_db()
+        self.assertEqual(other.unread_notification_count, 1)
+
+    def test_delete(self):
+        notify(self.user, 'unread')
+        notify(self.user, 'read')
+        read = self.user.notifications.get(message='read')
+        mark_read(self.user, read.pk)
+        self.assertCounted(1)
+        read.delete()
+        self.assertCounted(1)
+        self.user.notifications.get(message='unread').delete()
+        self.assertCounted(0)
+
+    def test_queryset_delete(self):
+        for message in ('one', 'two'):
+            notify(self.user, message)
+        Notification.objects.filter(user=self.user).delete()
+        self.assertCounted(0)
+
+
+class BulkNotifyTests(TestCase):
+    def setUp(self):
+        self.users = [make_user(f'student{i}') for i in range(5)]
+
+    def counts(self, users):
+        return [User.objects.get(pk=user.pk).unread_notification_count for user in users]
+
+    def test_notify_many_is_one_insert_and_one_update(self):
+        with self.assertNumQueries(2):
+            notify_many(self.users, 'Library closes early')
+        self.assertEqual(Notification.objects.filter(message='Library closes early').count(), 5)
+        self.assertEqual(self.counts(self.users), [1] * 5)
+
+    def test_notify_many_takes_primary_keys(self):
+        with self.assertNumQueries(2):
+            notify_many([user.pk for user in self.users[:3]], 'By pk')
+        self.assertEqual(self.counts(self.users), [1, 1, 1, 0, 0])
+
+    def test_one_update_per_distinct_increment(self):
+        first, second, third = self.users[:3]
+        notifications = [
+            Notification(user=user, message=f'{user.username} {i}')
+            for user, times in ((first, 2), (second, 2), (third, 1))
+            for i in range(times)
+        ]
+        with self.assertNumQueries(3):
+            create_notifications(notifications)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(self.counts([first, second, third]), [2, 2, 1])
+
+    def test_notify_staff_skips_students_and_the_excluded_user(self):
+        admin = make_user('admin', User.Role.ADMIN)
+        librarian = make_user('librarian', User.Role.LIBRARIAN)
+        other = make_user('other-librarian', User.Role.LIBRARIAN)
+        notify_staff('Stock check', exclude=librarian)
+        self.assertEqual(
+            set(Notification.objects.values_list('user__username', flat=True)), {'admin', 'other-librarian'}
+        )
+        self.assertEqual(self.counts([admin, librarian, other]), [1, 0, 1])
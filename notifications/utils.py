@@ -1,7 +1,9 @@
 # your_app/utils.py
+from collections import Counter
+
+from django.db.models import F
 from notifications.models import Notification
-from django.urls import reverse
-from books.models import Book  
+from accounts.models import User
 
 def notify(user, message, type='GEN', url=None):
     Notification.objects.create(
@@ -10,12 +12,57 @@ def notify(user, message, type='GEN', url=None):
         notification_type=type,
         related_url=url
     )
+    User.objects.filter(pk=user.pk).update(unread_notification_count=F('unread_notification_count') + 1)
 
-# context_processors.py (create if doesn't exist)
-from notifications.models import Notification
+def create_notifications(notifications):
+    """Bulk insert Notification objects and bump each recipient's unread counter"""
+    Notification.objects.bulk_create(notifications, batch_size=500)
+
+    # One UPDATE per distinct increment, usually just one for a fan-out
+    per_user = Counter(notification.user_id for notification in notifications)
+    users_by_increment = {}
+    for user_id, increment in per_user.items():
+        users_by_increment.setdefault(increment, []).append(user_id)
+    for increment, user_ids in users_by_increment.items():
+        User.objects.filter(pk__in=user_ids).update(
+            unread_notification_count=F('unread_notification_count') + increment
+        )
+
+def notify_many(users, message, type='GEN', url=None):
+    """Send the same notification to many users with a single bulk INSERT.
 
+    `users` may hold User instances or primary keys.
+    """
+    create_notifications([
+        Notification(
+            user_id=getattr(user, 'pk', user),
+            message=message,
+            notification_type=type,
+            related_url=url
+        )
+        for user in users
+    ])
+
+def notify_staff(message, type='GEN', url=None, exclude=None):
+    """Notify every admin and librarian, optionally skipping one user"""
+    staff_ids = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
+    if exclude is not None:
+        staff_ids = staff_ids.exclude(pk=exclude.pk)
+    notify_many(staff_ids.values_list('pk', flat=True), message, type=type, url=url)
+
+def mark_read(user, pk):
+    if user.notifications.filter(pk=pk, is_read=False).update(is_read=True):
+        User.objects.filter(pk=user.pk, unread_notification_count__gt=0).update(
+            unread_notification_count=F('unread_notification_count') - 1
+        )
+
+def mark_all_read(user):
+    user.notifications.filter(is_read=False).update(is_read=True)
+    User.objects.filter(pk=user.pk).update(unread_notification_count=0)
+
+# context_processors.py (create if doesn't exist)
 def notification_count(request):
     if request.user.is_authenticated:
-        count = Notification.objects.filter(user=request.user, is_read=False).count()
-        return {'unread_notification_count': count}
+        # Denormalized counter, already loaded with request.user
+        return {'unread_notification_count': request.user.unread_notification_count}
     return {}
@@ -1,37 +1,35 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from .models import Notification
-from django.core.paginator import Paginator
+from .utils import mark_read, mark_all_read
+from UniLib.pagination import paginate
 
 @login_required
 def notification_list(request):
-    notifications = request.user.notifications.all().order_by('-created_at')
-    paginator = Paginator(notifications, 10)  # Show 10 notifications per page
+    notifications = request.user.notifications.all()
+    # Cursor pages by default, ?page=N for numbered pages
+    paginator, page_obj = paginate(request, notifications, 10, 'created_at')
     
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Calculate counts
-    unread_count = request.user.notifications.filter(is_read=False).count()
-    total_count = request.user.notifications.count()
-    read_count = total_count - unread_count
+    # Calculate counts (the cursor paginator's total is approximate)
+    unread_count = request.user.unread_notification_count
+    total_count = paginator.count
+    read_count = max(total_count - unread_count, 0)
     
     return render(request, 'notifications/notification_list.html', {
         'notifications': page_obj,
         'has_next': page_obj.has_next(),
         'unread_count': unread_count,
         'read_count': read_count,
-        'total_count': total_count
+        'total_count': total_count,
+        'count_is_exact': getattr(paginator, 'count_is_exact', True),
     })
 
 @login_required
 def mark_as_read(request, pk):
-    notification = request.user.notifications.get(pk=pk)
-    notification.is_read = True
-    notification.save()
+    mark_read(request.user, pk)
     return redirect('notification-list')
 
 @login_required
 def mark_all_as_read(request):
-    request.user.notifications.filter(is_read=False).update(is_read=True)
+    mark_all_read(request.user)
     return redirect('notification-list')
\ No newline at end of file
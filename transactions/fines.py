@@ -0,0 +1,90 @@
+# transactions/fines.py
+
+from django.conf import settings
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User
+from notifications.models import Notification
+from notifications.outbox import queue_emails
+from notifications.utils import create_notifications
+from .models import Borrow, Fine, OVERDUE_FINE_AMOUNT
+from .stats import invalidate_stats
+
+
+def assess_overdue_fines(batch_size=500, domain=None):
+    """
+    Fine every overdue borrow that hasn't been fined yet.
+
+    Borrows are processed in primary key order, batch_size at a time. Each
+    batch bulk-inserts its Fine rows, notifications and outbox emails in one
+    transaction. Returns the number of fines created.
+    """
+    domain = domain or getattr(settings, 'DOMAIN', '127.0.0.1:8000')
+    staff_ids = list(User.objects.filter(
+        role__in=[User.Role.ADMIN, User.Role.LIBRARIAN]
+    ).values_list('pk', flat=True))
+
+    pending = Borrow.objects.filter(
+        is_returned=False,
+        due_date__lt=timezone.now().date(),
+        overdue_notification_sent=False,
+        fine__isnull=True,
+    ).select_related('user', 'book').order_by('pk')
+
+    created = 0
+    last_pk = 0
+    while True:
+        batch = list(pending.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        created += _assess_batch(batch, staff_ids, domain)
+    return created
+
+
+def _assess_batch(borrows, staff_ids, domain):
+    fines = {
+        borrow.pk: Fine(user_id=borrow.user_id, borrow=borrow, amount=OVERDUE_FINE_AMOUNT)
+        for borrow in borrows
+    }
+    # Built up front, outside the transaction, and sent only for the fines this batch inserts
+    messages = {}
+    for borrow in borrows:
+        fine = fines[borrow.pk]
+        book_url = reverse('book-detail', kwargs={'pk': borrow.book_id})
+        notifications = [Notification(
+            user_id=borrow.user_id, message=borrow.overdue_message(fine),
+            notification_type='FINE', related_url=book_url,
+        )]
+        notifications.extend(
+            Notification(
+                user_id=staff_id, message=borrow.staff_overdue_message(fine),
+                notification_type='FINE', related_url=book_url,
+            )
+            for staff_id in staff_ids if staff_id != borrow.user_id
+        )
+        emails = []
+        # Email notification only for students/faculty
+        if borrow.user.role in [User.Role.STUDENT, User.Role.FACULTY]:
+            emails.append(borrow.build_overdue_email(
+                borrow.user, borrow.book, fine, f"http://{domain}{book_url}"
+            ))
+        messages[borrow.pk] = (notifications, emails)
+
+    with transaction.atomic():
+        # Lock the borrows so a concurrent run waits instead of fining them between
+        # the lookup and the insert, then skip the ones another run fined first
+        list(Borrow.objects.select_for_update().filter(pk__in=list(fines)).values_list('pk', flat=True))
+        already_fined = set(Fine.objects.filter(borrow_id__in=list(fines)).values_list('borrow_id', flat=True))
+        fined = [pk for pk in fines if pk not in already_fined]
+        Fine.objects.bulk_create([fines[pk] for pk in fined], ignore_conflicts=True)
+        Borrow.objects.filter(pk__in=list(fines)).update(overdue_notification_sent=True)
+        create_notifications([notification for pk in fined for notification in messages[pk][0]])
+        queue_emails([email for pk in fined for email in messages[pk][1]])
+
+    # bulk_create skips post_save, so the cached stat tiles are cleared here
+    for user_id in {fines[pk].user_id for pk in fined}:
+        invalidate_stats(user_id)
+    return len(fined)
@@ -0,0 +1,63 @@
+# transactions/inventory.py
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from books.cache import invalidate_catalog
+from books.models import Book
+
+
+class NoCopyAvailable(Exception):
+    """Raised when a checkout finds no copy of the book on the shelf"""
+
+
+def checkout_copy(book):
+    """
+    Take one copy of `book` off the shelf.
+
+    A single conditional UPDATE, so concurrent checkouts can neither lose a
+    decrement nor drive available_copies below zero. Call it inside the same
+    transaction as the Borrow insert.
+    """
+    taken = Book.objects.filter(pk=book.pk, available_copies__gt=0).update(
+        available_copies=F('available_copies') - 1
+    )
+    if not taken:
+        raise NoCopyAvailable(f"No copies of '{book.title}' are available")
+    book.refresh_from_db(fields=['available_copies'])
+
+
+def checkin_copy(book):
+    """Put one copy of `book` back on the shelf, never exceeding total_copies"""
+    Book.objects.filter(pk=book.pk, available_copies__lt=F('total_copies')).update(
+        available_copies=F('available_copies') + 1
+    )
+    book.refresh_from_db(fields=['available_copies'])
+    # A return saves no Borrow or Book, so no signal refreshes the cached copy counts
+    invalidate_catalog()
+
+
+def promote_next_reservation(book):
+    """
+    Mark the oldest pending reservation of `book` as AVAILABLE and return it.
+
+    The status change is conditional on the row still being PENDING, so two
+    returns racing each other never promote the same reservation twice.
+    Returns None when nobody is waiting.
+    """
+    from .models import Reservation
+
+    with transaction.atomic():
+        for reservation in Reservation.objects.filter(book=book, status='PENDING').order_by('reservation_date')[:5]:
+            now = timezone.now()
+            promoted = Reservation.objects.filter(pk=reservation.pk, status='PENDING').update(
+                status='AVAILABLE', notified_at=now
+            )
+            if promoted:
+                reservation.status = 'AVAILABLE'
+                reservation.notified_at = now
+                # Saved again so post_save listeners (cached stats) see the change
+                reservation.save(update_fields=['status', 'notified_at'])
+                return reservation
+    return None
@@ -0,0 +1,83 @@
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.utils import timezone
+from accounts.models import User
+from books.models import Book
+from transactions.inventory import NoCopyAvailable
+from transactions.models import Borrow
+
+class Command(BaseCommand):
+    help = ('Stress-test concurrent checkouts of one book, verify no copy is lost '
+            'and report checkouts/sec. Creates throwaway rows and deletes them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--copies', type=int, default=200)
+        parser.add_argument('--attempts', type=int, default=50, help='Checkouts attempted per thread')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        copies = options['copies']
+        book = Book.objects.create(
+            title=f'Checkout benchmark {tag}', author='bench', isbn=f'B{tag}', total_copies=copies
+        )
+        users = [
+            User.objects.create(username=f'bench-{tag}-{i}', email=f'bench-{tag}-{i}@example.com',
+                                university_id=f'bench-{tag}-{i}', is_active=False)
+            for i in range(options['threads'])
+        ]
+        results = Counter()
+        lock = threading.Lock()
+        due_date = timezone.now().date() + timedelta(days=7)
+
+        def worker(user):
+            local = Counter()
+            try:
+                thread_book = Book.objects.get(pk=book.pk)
+                for _ in range(options['attempts']):
+                    try:
+                        Borrow.objects.create(user=user, book=thread_book, due_date=due_date)
+                        local['borrowed'] += 1
+                    except NoCopyAvailable:
+                        local['sold_out'] += 1
+                    except OperationalError:
+                        local['locked'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    results.update(local)
+
+        try:
+            threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            book.refresh_from_db()
+            borrows = Borrow.objects.filter(book=book).count()
+        finally:
+            book.delete()
+            User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+        self.stdout.write(
+            f"{results['borrowed']} checkouts, {results['sold_out']} refused (no copies), "
+            f"{results['locked']} failed (database locked) in {elapsed:.2f}s "
+            f"= {results['borrowed'] / elapsed:.1f} checkouts/sec"
+        )
+        lost = copies - book.available_copies - borrows
+        if lost or borrows != results['borrowed']:
+            raise CommandError(
+                f"Inventory mismatch: {copies} copies, {book.available_copies} available, {borrows} borrows"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"No lost updates: {copies} copies = {book.available_copies} available + {borrows} borrowed"
+        ))
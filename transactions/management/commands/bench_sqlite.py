@@ -0,0 +1,123 @@
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# Plain sqlite3 connections on a scratch database, so the numbers compare the
+# connection settings rather than the contents of db.sqlite3.
+SCHEMA = """
+CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT, available_copies INTEGER NOT NULL);
+CREATE TABLE borrow (id INTEGER PRIMARY KEY, book_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+                     is_returned INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX borrow_user_idx ON borrow (user_id) WHERE NOT is_returned;
+"""
+
+# What Django's sqlite backend does when no OPTIONS are given
+DEFAULT_PROFILE = {'timeout': 5, 'transaction_mode': 'DEFERRED', 'pragmas': []}
+
+
+def configured_profile():
+    options = settings.DATABASES['default'].get('OPTIONS', {})
+    return {
+        'timeout': options.get('timeout', 5),
+        'transaction_mode': options.get('transaction_mode') or 'DEFERRED',
+        'pragmas': [command.strip() for command in options.get('init_command', '').split(';') if command.strip()],
+    }
+
+
+class Command(BaseCommand):
+    help = ('Measure mixed read/write throughput of concurrent SQLite connections with '
+            "SQLite's defaults and with the OPTIONS from settings.DATABASES.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=5, help='Seconds per run')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Fraction of operations that are checkouts (0-1)')
+        parser.add_argument('--books', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for label, profile in (('default', DEFAULT_PROFILE), ('settings', configured_profile())):
+            with tempfile.TemporaryDirectory() as directory:
+                path = Path(directory) / 'bench.sqlite3'
+                self.setup(path, options['books'])
+                results, elapsed = self.run(path, profile, options)
+
+            ops = results['reads'] + results['writes']
+            self.stdout.write(
+                f"{label:>8}: {ops / elapsed:8.1f} ops/sec "
+                f"({results['reads']} reads, {results['writes']} writes, "
+                f"{results['locked']} 'database is locked' errors in {elapsed:.2f}s)"
+            )
+
+    def setup(self, path, books):
+        conn = sqlite3.connect(path)
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO book (id, title, available_copies) VALUES (?, ?, ?)',
+            [(i, f'Book {i}', 1000) for i in range(1, books + 1)]
+        )
+        conn.commit()
+        conn.close()
+
+    def connect(self, path, profile):
+        # Mirrors DatabaseWrapper.get_new_connection()
+        conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None,
+                               check_same_thread=False)
+        for pragma in profile['pragmas']:
+            conn.execute(pragma)
+        return conn
+
+    def run(self, path, profile, options):
+        results = Counter()
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+        books = options['books']
+
+        def worker(user_id):
+            local = Counter()
+            conn = self.connect(path, profile)
+            rng = random.Random(user_id)
+            try:
+                while time.perf_counter() < deadline:
+                    book_id = rng.randint(1, books)
+                    try:
+                        if rng.random() < options['write_ratio']:
+                            # Same shape as a checkout: read the stock, then write
+                            conn.execute(f"BEGIN {profile['transaction_mode']}")
+                            try:
+                                conn.execute('SELECT available_copies FROM book WHERE id = ?', [book_id]).fetchone()
+                                conn.execute('UPDATE book SET available_copies = available_copies - 1 WHERE id = ?',
+                                             [book_id])
+                                conn.execute('INSERT INTO borrow (book_id, user_id) VALUES (?, ?)',
+                                             [book_id, user_id])
+                                conn.execute('COMMIT')
+                            except sqlite3.OperationalError:
+                                conn.execute('ROLLBACK')
+                                raise
+                            local['writes'] += 1
+                        else:
+                            conn.execute('SELECT title, available_copies FROM book WHERE id = ?', [book_id]).fetchone()
+                            conn.execute('SELECT count(*) FROM borrow WHERE user_id = ? AND NOT is_returned',
+                                         [user_id]).fetchone()
+                            local['reads'] += 1
+                    except sqlite3.OperationalError:
+                        local['locked'] += 1
+            finally:
+                conn.close()
+                with lock:
+                    results.update(local)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - start
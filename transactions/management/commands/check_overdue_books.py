@@ -1,29 +1,15 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
-from transactions.models import Borrow
+from transactions.fines import assess_overdue_fines
 
 class Command(BaseCommand):
-    help = 'Check for overdue books and create fines'
+    help = 'Check for overdue books and create fines (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
 
     def handle(self, *args, **options):
-        overdue_borrows = Borrow.objects.filter(
-            is_returned=False,
-            due_date__lt=timezone.now().date(),
-            overdue_notification_sent=False
-        )
-        
-        self.stdout.write(f"Found {overdue_borrows.count()} overdue borrows")
-        
-        for borrow in overdue_borrows:
-            self.stdout.write(f"Processing overdue: {borrow}")
-            fine_created = borrow.check_and_create_fine()
-            if fine_created:
-                borrow.overdue_notification_sent = True
-                borrow.save(update_fields=['overdue_notification_sent'])
-                self.stdout.write(f"✓ Fine created and notification sent for {borrow}")
-            else:
-                self.stdout.write(f"✗ No fine created for {borrow}")
+        fine_count = assess_overdue_fines(batch_size=options['batch_size'])
         
         self.stdout.write(
-            self.style.SUCCESS('Successfully processed all overdue books')
-        )
\ No newline at end of file
+            self.style.SUCCESS(f'Created {fine_count} new fines with notifications')
+        )
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from transactions.exports import EXPORTS, FORMATS, export_rows, stream_export
+
+class Command(BaseCommand):
+    help = 'Stream every borrow, fine or reservation as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=list(EXPORTS))
+        parser.add_argument('--format', choices=list(FORMATS), default='csv')
+        parser.add_argument('--output', default='-', help="File to write, '-' (the default) is standard output")
+        parser.add_argument('--search', default='', help='Borrows only, same as the borrow list search box')
+        parser.add_argument('--status', default='',
+                            help='active/overdue/returned for borrows, paid/unpaid for fines, a reservation status')
+        parser.add_argument('--from', dest='date_from', default='', help='First day to export, YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', default='', help='Last day to export, YYYY-MM-DD')
+
+    def handle(self, *args, **options):
+        try:
+            header, rows = export_rows(options['name'], {
+                'search': options['search'], 'status': options['status'],
+                'from': options['date_from'], 'to': options['date_to'],
+            })
+        except ValueError as e:
+            raise CommandError(e)
+        output = sys.stdout if options['output'] == '-' else open(options['output'], 'w', newline='', encoding='utf-8')
+        try:
+            for chunk in stream_export(header, rows, options['format']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
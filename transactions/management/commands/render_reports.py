@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from transactions.reports import prune_reports, render_pending_reports, report_pool
+
+class Command(BaseCommand):
+    help = 'Render queued PDF reports in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.REPORT_WORKERS,
+                            help='Rendering processes, 0 renders in this process')
+        parser.add_argument('--loop', action='store_true', help='Keep running and poll for queued reports')
+        parser.add_argument('--interval', type=float, default=2, help='Seconds to sleep when nothing is queued')
+        parser.add_argument('--prune', type=int, metavar='DAYS',
+                            help='Delete reports and their files older than DAYS first')
+
+    def handle(self, *args, **options):
+        if options['prune'] is not None:
+            pruned = prune_reports(timedelta(days=options['prune']))
+            self.stdout.write(f"Pruned {pruned} reports")
+
+        workers = options['workers']
+        pool = report_pool(workers) if workers else None
+        try:
+            while True:
+                rendered, failed = render_pending_reports(pool, batch_size=max(workers, 1) * 2)
+                if rendered or failed:
+                    self.stdout.write(f"Rendered {rendered} reports, {failed} failed")
+                if not options['loop']:
+                    break
+                if not (rendered or failed):
+                    time.sleep(options['interval'])
+        finally:
+            if pool:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS('Report queue processed'))
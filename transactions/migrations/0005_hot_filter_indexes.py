@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0003_bookpopularity'),
+        ('transactions', '0004_borrow_overdue_notification_sent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', False)), fields=['user'], name='borrow_active_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', False)), fields=['due_date'], name='borrow_active_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('is_returned', False)), fields=['book', 'user'], name='borrow_active_book_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['user'], name='fine_user_unpaid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['user', 'status'], name='reservation_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(condition=models.Q(('status', 'PENDING')), fields=['book', 'reservation_date'], name='reservation_pending_queue_idx'),
+        ),
+    ]
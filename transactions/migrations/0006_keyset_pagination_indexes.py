@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0004_postgres_catalog_indexes'),
+        ('transactions', '0005_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['issue_date', 'id'], name='borrow_issue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user', 'issue_date', 'id'], name='borrow_user_issue_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(fields=['created_at', 'id'], name='fine_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fine',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='fine_user_created_idx'),
+        ),
+    ]
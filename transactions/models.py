@@ -1,11 +1,39 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from accounts.models import User
 from books.models import Book
-from notifications.utils import notify
+from notifications.utils import notify, notify_staff
+from .inventory import checkout_copy, checkin_copy
 from django.urls import reverse
 from django.conf import settings
+
+OVERDUE_FINE_AMOUNT = 50  # fixed fine for an overdue book
+
+class BorrowQuerySet(models.QuerySet):
+    """The search box and status tabs of the borrow list, shared with the exports"""
+
+    def search(self, query):
+        if not query:
+            return self
+        return self.filter(
+            models.Q(book__title__icontains=query) |
+            models.Q(book__author__icontains=query) |
+            models.Q(user__first_name__icontains=query) |
+            models.Q(user__last_name__icontains=query) |
+            models.Q(user__email__icontains=query) |
+            models.Q(user__university_id__icontains=query)
+        )
+
+    def with_status(self, status):
+        if status == 'active':
+            return self.filter(is_returned=False)
+        if status == 'overdue':
+            return self.filter(is_returned=False, due_date__lt=timezone.now().date())
+        if status == 'returned':
+            return self.filter(is_returned=True)
+        return self
+
 class Borrow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='borrows')
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='borrows')
@@ -15,27 +43,36 @@ class Borrow(models.Model):
     return_date = models.DateField(null=True, blank=True)
     is_returned = models.BooleanField(default=False)
     overdue_notification_sent = models.BooleanField(default=False)
+
+    objects = BorrowQuerySet.as_manager()
     
     def __str__(self):
         return f"{self.user} borrowed {self.book}"
 
     def save(self, *args, **kwargs):
-        is_new = not self.pk
-        
-        # Handle book copy count for new borrows
-        if is_new:
-            self.book.available_copies -= 1
-            self.book.save()
+        if self.pk:
+            super().save(*args, **kwargs)
+            return
         
-        super().save(*args, **kwargs)
+        # Take the copy and insert the borrow atomically (raises NoCopyAvailable)
+        with transaction.atomic():
+            checkout_copy(self.book)
+            super().save(*args, **kwargs)
 
     def return_book(self):
-        if not self.is_returned:
+        """Mark the borrow returned; returns False if it already was (nothing freed)"""
+        if self.is_returned:
+            return False
+        with transaction.atomic():
+            # Conditional update so a double-submitted return only frees one copy
+            returned = Borrow.objects.filter(pk=self.pk, is_returned=False).update(
+                is_returned=True, return_date=timezone.now().date()
+            )
             self.is_returned = True
             self.return_date = timezone.now().date()
-            self.book.available_copies += 1
-            self.book.save()
-            self.save()
+            if returned:
+                checkin_copy(self.book)
+        return bool(returned)
     
     @property
     def is_overdue(self):
@@ -57,15 +94,12 @@ class Borrow(models.Model):
         print(f"Checking fine for borrow: {self}, overdue: {self.is_overdue}, has_fine: {hasattr(self, 'fine')}")
         
         if self.is_overdue and not hasattr(self, 'fine'):
-            # Calculate fine amount - $50 fixed fine for overdue
-            fine_amount = 50
-            
             # Create fine only if it doesn't exist
             fine, created = Fine.objects.get_or_create(
                 borrow=self,
                 defaults={
                     'user': self.user,
-                    'amount': fine_amount,
+                    'amount': OVERDUE_FINE_AMOUNT,
                     'is_paid': False
                 }
             )
@@ -99,19 +133,12 @@ class Borrow(models.Model):
             
             absolute_book_url = f"http://{domain}{book_url}"
             
-            # Notification message
-            overdue_message = f"Your book '{book.title}' is overdue by {self.overdue_days} days. A fine of ${fine.amount} has been applied."
-            
             # In-app notifications for both student/faculty AND staff
-            notify(borrower, overdue_message, type='FINE', url=book_url)
+            notify(borrower, self.overdue_message(fine), type='FINE', url=book_url)
             print(f"In-app notification sent to {borrower.email}")
             
             # Notify all staff (admin/librarian) about the overdue
-            staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-            for staff in staff_users:
-                if staff != borrower:
-                    staff_message = f"Book '{book.title}' borrowed by {borrower.get_full_name()} is overdue by {self.overdue_days} days. Fine applied: ${fine.amount}"
-                    notify(staff, staff_message, type='FINE', url=book_url)
+            notify_staff(self.staff_overdue_message(fine), type='FINE', url=book_url, exclude=borrower)
             
             # Email notification only for students/faculty
             if borrower.role in [User.Role.STUDENT, User.Role.FACULTY]:
@@ -120,8 +147,20 @@ class Borrow(models.Model):
         except Exception as e:
             print(f"Error sending notifications: {e}")
 
+    def overdue_message(self, fine):
+        return f"Your book '{self.book.title}' is overdue by {self.overdue_days} days. A fine of ${fine.amount} has been applied."
+
+    def staff_overdue_message(self, fine):
+        return f"Book '{self.book.title}' borrowed by {self.user.get_full_name()} is overdue by {self.overdue_days} days. Fine applied: ${fine.amount}"
+
     def send_overdue_email(self, user, book, fine, book_url):
-        """Send email notification for overdue book"""
+        """Queue email notification for overdue book"""
+        from notifications.outbox import queue_email
+        
+        queue_email(self.build_overdue_email(user, book, fine, book_url))
+
+    def build_overdue_email(self, user, book, fine, book_url):
+        """Build (but don't send) the overdue notice email"""
         from django.core.mail import EmailMultiAlternatives
         from django.template.loader import render_to_string
         
@@ -162,23 +201,31 @@ class Borrow(models.Model):
             print(f"Error rendering email template: {e}")
             html_content = None
         
-        try:
-            email = EmailMultiAlternatives(
-                subject, 
-                text_content, 
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email]
-            )
-            
-            if html_content:
-                email.attach_alternative(html_content, "text/html")
-            
-            email.send()
-            print(f"✓ Email sent successfully to {user.email}")
-            
-        except Exception as e:
-            print(f"✗ Failed to send email to {user.email}: {e}")
-            
+        email = EmailMultiAlternatives(
+            subject, 
+            text_content, 
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[user.email]
+        )
+        
+        if html_content:
+            email.attach_alternative(html_content, "text/html")
+        return email
+
+    class Meta:
+        indexes = [
+            # Partial indexes: the hot queries all look at active (not returned) borrows.
+            # Django renders is_returned=False as NOT "is_returned", which a plain
+            # composite index on the flag can't seek on.
+            models.Index(fields=['user'], condition=models.Q(is_returned=False), name='borrow_active_user_idx'),
+            models.Index(fields=['due_date'], condition=models.Q(is_returned=False), name='borrow_active_due_idx'),
+            models.Index(fields=['book', 'user'], condition=models.Q(is_returned=False), name='borrow_active_book_user_idx'),
+            # Keyset pagination of the borrow list (UniLib/pagination.py)
+            models.Index(fields=['issue_date', 'id'], name='borrow_issue_date_idx'),
+            models.Index(fields=['user', 'issue_date', 'id'], name='borrow_user_issue_date_idx'),
+        ]
+
+
 class Fine(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='fines')
     borrow = models.OneToOneField(Borrow, on_delete=models.CASCADE, related_name='fine')
@@ -210,11 +257,16 @@ class Fine(models.Model):
         notify(self.user, user_message, type='FINE', url=book_url)
         
         # Notify staff about the payment
-        staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-        for staff in staff_users:
-            if staff != self.user:
-                staff_message = f"Fine of ${self.amount} for '{book.title}' has been paid by {self.user.get_full_name()}."
-                notify(staff, staff_message, type='FINE', url=book_url)
+        staff_message = f"Fine of ${self.amount} for '{book.title}' has been paid by {self.user.get_full_name()}."
+        notify_staff(staff_message, type='FINE', url=book_url, exclude=self.user)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user'], condition=models.Q(is_paid=False), name='fine_user_unpaid_idx'),
+            # Keyset pagination of the fine list
+            models.Index(fields=['created_at', 'id'], name='fine_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='fine_user_created_idx'),
+        ]
 
 class Reservation(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservations')
@@ -233,4 +285,38 @@ class Reservation(models.Model):
         return f"{self.user} reserved {self.book}"
     
     class Meta:
-        ordering = ['reservation_date']
\ No newline at end of file
+        ordering = ['reservation_date']
+        indexes = [
+            # A user's reservations by status, in the Meta.ordering order without a sort step
+            models.Index(fields=['user', 'status', 'reservation_date'], name='reservation_user_status_idx'),
+            # Queue of pending reservations per book, oldest first
+            models.Index(fields=['book', 'reservation_date'], condition=models.Q(status='PENDING'), name='reservation_pending_queue_idx'),
+        ]
+
+class Report(models.Model):
+    """A PDF report rendered in the background, see transactions/reports.py"""
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        RUNNING = 'RUNNING', 'Rendering'
+        DONE = 'DONE', 'Ready'
+        FAILED = 'FAILED', 'Failed'
+
+    # sha256 of the report name, its parameters and the data version
+    key = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=20)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    error = models.TextField(blank=True)
+    size = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} {self.params} ({self.get_status_display()})"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+        ]
@@ -0,0 +1,345 @@
+# transactions/reports.py
+"""
+PDF reports: monthly circulation, overdue borrows, fines collected in a
+month and per-user borrowing statements.
+
+A report is identified by a key, the sha256 of its name, its parameters
+and a version of the data it is built from (an aggregate query over
+the rows it covers, so a borrow returned or a fine paid gives a new key).
+The PDF is stored as REPORTS_ROOT/<name>/<key>.pdf. Asking again for
+unchanged data finds the file and sends it from disk; nothing is rendered
+during the request. A missing file gets a PENDING Report row instead, which
+`manage.py render_reports` picks up and renders with WeasyPrint in a pool
+of REPORT_WORKERS processes.
+
+Staff can run every report, students and faculty only their own statement.
+"""
+
+import datetime
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import django
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Borrow, Fine, Report
+
+CLAIM_TIMEOUT = datetime.timedelta(minutes=10)  # a crashed worker's report is rendered again after this
+TOP_BOOKS = 20
+STATEMENT_BORROWS = 1000  # latest borrows listed on a statement, the totals cover all of them
+
+ReportType = namedtuple('ReportType', 'title template params version context')
+
+
+def _is_staff(user):
+    return user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]
+
+
+def _month(value):
+    """'YYYY-MM' (default this month) -> (first day, first day of the next month)"""
+    if value:
+        try:
+            start = datetime.datetime.strptime(value, '%Y-%m').date()
+        except ValueError:
+            raise ValueError('month must look like 2025-10')
+    else:
+        start = timezone.localdate().replace(day=1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def _month_params(query, user):
+    return {'month': f'{_month(query.get("month"))[0]:%Y-%m}'}
+
+
+def _today_params(query, user):
+    return {'date': timezone.localdate().isoformat()}
+
+
+def _statement_params(query, user):
+    if not (query.get('user') and _is_staff(user)):
+        return {'user': user.pk}
+    try:
+        user_id = int(query['user'])
+    except ValueError:
+        raise ValueError('user must be a user id')
+    if not User.objects.filter(pk=user_id).exists():
+        raise ValueError(f'There is no user {user_id}')
+    return {'user': user_id}
+
+
+# Circulation: books issued and returned during the month
+
+def _circulation_borrows(params):
+    start, end = _month(params['month'])
+    issued = Q(issue_date__gte=start, issue_date__lt=end)
+    returned = Q(return_date__gte=start, return_date__lt=end)
+    return Borrow.objects.filter(issued | returned), issued, returned
+
+
+def _circulation_version(params):
+    borrows, issued, returned = _circulation_borrows(params)
+    return borrows.aggregate(
+        count=Count('id'), ids=Sum('id'), returned=Count('id', filter=Q(is_returned=True))
+    )
+
+
+def _circulation_context(params):
+    borrows, issued, returned = _circulation_borrows(params)
+    issued_borrows = Borrow.objects.filter(issued)
+    return {
+        'totals': borrows.aggregate(
+            issued=Count('id', filter=issued),
+            returned=Count('id', filter=returned),
+            borrowers=Count('user', filter=issued, distinct=True),
+            books=Count('book', filter=issued, distinct=True),
+        ),
+        'by_day': list(
+            issued_borrows.values('issue_date').annotate(issued=Count('id')).order_by('issue_date')
+        ),
+        'by_category': list(
+            issued_borrows.values('book__category__name').annotate(issued=Count('id')).order_by('-issued')
+        ),
+        'top_books': list(
+            issued_borrows.values('book__title', 'book__author').annotate(issued=Count('id'))
+            .order_by('-issued', 'book__title')[:TOP_BOOKS]
+        ),
+    }
+
+
+# Overdue: borrows still out past their due date, as of params['date']
+
+def _overdue_borrows(params):
+    return Borrow.objects.filter(is_returned=False, due_date__lt=params['date'])
+
+
+def _overdue_version(params):
+    return _overdue_borrows(params).aggregate(
+        count=Count('id'), ids=Sum('id'), fined=Count('fine'), paid=Count('fine', filter=Q(fine__is_paid=True))
+    )
+
+
+def _overdue_context(params):
+    date = datetime.date.fromisoformat(params['date'])
+    borrows = list(
+        _overdue_borrows(params).select_related('user', 'book', 'fine').order_by('due_date', 'pk')
+    )
+    for borrow in borrows:
+        borrow.days_late = (date - borrow.due_date).days
+    return {
+        'borrows': borrows,
+        'borrowers': len({borrow.user_id for borrow in borrows}),
+        'unpaid': sum(borrow.fine.amount for borrow in borrows if borrow.has_unpaid_fine),
+    }
+
+
+# Fines: collected (paid) and issued during the month
+
+def _fine_filters(params):
+    start, end = _month(params['month'])
+    return Q(paid_at__date__gte=start, paid_at__date__lt=end), Q(created_at__date__gte=start, created_at__date__lt=end)
+
+
+def _fines_version(params):
+    paid, issued = _fine_filters(params)
+    return Fine.objects.filter(paid | issued).aggregate(
+        count=Count('id'), ids=Sum('id'), paid=Count('id', filter=Q(is_paid=True)), amount=Sum('amount')
+    )
+
+
+def _fines_context(params):
+    paid, issued = _fine_filters(params)
+    return {
+        'fines': list(
+            Fine.objects.filter(paid).select_related('user', 'borrow__book').order_by('paid_at', 'pk')
+        ),
+        'totals': Fine.objects.filter(paid | issued).aggregate(
+            collected=Sum('amount', filter=paid, default=0),
+            collected_count=Count('id', filter=paid),
+            issued=Sum('amount', filter=issued, default=0),
+            issued_count=Count('id', filter=issued),
+        ),
+    }
+
+
+# Statement: everything one user has borrowed, and their fines
+
+def _statement_version(params):
+    user = User.objects.get(pk=params['user'])
+    version = Borrow.objects.filter(user=user).aggregate(
+        count=Count('id'), ids=Sum('id'), returned=Count('id', filter=Q(is_returned=True)),
+        fines=Count('fine'), paid=Count('fine', filter=Q(fine__is_paid=True)), last_return=Max('return_date'),
+    )
+    version['name'] = user.get_full_name()
+    return version
+
+
+def _statement_context(params):
+    user = User.objects.get(pk=params['user'])
+    return {
+        'member': user,
+        'borrows': list(user.borrows.select_related('book', 'fine').order_by('-issue_date', '-pk')[:STATEMENT_BORROWS]),
+        'borrow_count': user.borrows.count(),
+        'totals': Fine.objects.filter(user=user).aggregate(
+            unpaid=Sum('amount', filter=Q(is_paid=False), default=0),
+            paid=Sum('amount', filter=Q(is_paid=True), default=0),
+        ),
+    }
+
+
+REPORTS = {
+    'circulation': ReportType('Monthly circulation', 'transactions/reports/circulation.html',
+                              _month_params, _circulation_version, _circulation_context),
+    'overdue': ReportType('Overdue books', 'transactions/reports/overdue.html',
+                          _today_params, _overdue_version, _overdue_context),
+    'fines': ReportType('Fines collected', 'transactions/reports/fines.html',
+                        _month_params, _fines_version, _fines_context),
+    'statement': ReportType('Borrowing statement', 'transactions/reports/statement.html',
+                            _statement_params, _statement_version, _statement_context),
+}
+
+
+def report_params(name, query, user):
+    """
+    Parameters of report name from a query dict, for user. Raises
+    PermissionDenied for reports the user may not run, ValueError for bad
+    parameters.
+    """
+    if name != 'statement' and not _is_staff(user):
+        raise PermissionDenied
+    return REPORTS[name].params(query, user)
+
+
+def report_key(name, params):
+    version = REPORTS[name].version(params)
+    data = json.dumps([name, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def report_path(name, key):
+    return os.path.join(settings.REPORTS_ROOT, name, f'{key}.pdf')
+
+
+def request_report(name, params, key, user=None):
+    """
+    The Report for key, queued for rendering if there isn't one yet, or if
+    it was rendered but its file has since been deleted (e.g. by a cleanup
+    of REPORTS_ROOT).
+    """
+    report, created = Report.objects.get_or_create(
+        key=key, defaults={'name': name, 'params': params, 'requested_by': user}
+    )
+    if not created and report.status == Report.Status.DONE and not os.path.exists(report_path(name, key)):
+        # Conditional, so two requests for the same missing file queue it once
+        Report.objects.filter(pk=report.pk, status=Report.Status.DONE).update(
+            status=Report.Status.PENDING, error='', size=0, started_at=None, finished_at=None
+        )
+        report.refresh_from_db()
+    return report
+
+
+def render_report(report_id):
+    """Render one report to its file unless it is already there; returns the file size"""
+    report = Report.objects.get(pk=report_id)
+    path = report_path(report.name, report.key)
+    if not os.path.exists(path):
+        # Imported here so the web processes never load WeasyPrint and its native libraries
+        from weasyprint import HTML
+
+        report_type = REPORTS[report.name]
+        html = render_to_string(report_type.template, {
+            'title': report_type.title,
+            'params': report.params,
+            'generated_at': timezone.now(),
+            **report_type.context(report.params),
+        })
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written under a temporary name so a download never sees half a file
+        part = f'{path}.{os.getpid()}.part'
+        HTML(string=html, base_url=str(settings.BASE_DIR)).write_pdf(part)
+        os.replace(part, path)
+    return os.path.getsize(path)
+
+
+def claim_reports(limit):
+    """Mark up to limit queued reports RUNNING and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            Report.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Report.Status.PENDING) |
+                Q(status=Report.Status.RUNNING, started_at__lt=now - CLAIM_TIMEOUT)
+            ).order_by('created_at')[:limit]
+        )
+        Report.objects.filter(pk__in=[report.pk for report in batch]).update(
+            status=Report.Status.RUNNING, started_at=now
+        )
+    return batch
+
+
+def report_pool(workers=None):
+    """
+    Process pool for render_pending_reports(). Spawned rather than forked,
+    so the workers don't share the parent's database connections.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or settings.REPORT_WORKERS,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def _outcome(render):
+    try:
+        return render(), None
+    except Exception as e:
+        return 0, e
+
+
+def render_pending_reports(pool=None, batch_size=1):
+    """
+    Render up to batch_size queued reports, in pool's processes if given,
+    inline otherwise. Returns a (rendered, failed) tuple.
+    """
+    batch = claim_reports(batch_size)
+    if not batch:
+        return 0, 0
+    if pool:
+        futures = [pool.submit(render_report, report.pk) for report in batch]
+        outcomes = [_outcome(future.result) for future in futures]
+    else:
+        outcomes = [_outcome(partial(render_report, report.pk)) for report in batch]
+
+    for report, (size, error) in zip(batch, outcomes):
+        Report.objects.filter(pk=report.pk).update(
+            status=Report.Status.FAILED if error else Report.Status.DONE,
+            error=f'{type(error).__name__}: {error}' if error else '',
+            size=size,
+            finished_at=timezone.now(),
+        )
+    failed = sum(1 for _, error in outcomes if error)
+    return len(batch) - failed, failed
+
+
+def prune_reports(older_than):
+    """Delete reports (and their files) created more than older_than ago; returns how many"""
+    reports = Report.objects.filter(created_at__lt=timezone.now() - older_than).exclude(status=Report.Status.RUNNING)
+    pruned = 0
+    for report in reports.only('pk', 'name', 'key'):
+        try:
+            os.remove(report_path(report.name, report.key))
+        except FileNotFoundError:
+            pass
+        report.delete()
+        pruned += 1
+    return pruned
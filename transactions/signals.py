@@ -0,0 +1,32 @@
+# transactions/signals.py
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from books.cache import invalidate_catalog
+from books.models import BookPopularity
+from .models import Borrow, Fine, Reservation
+from .stats import invalidate_stats
+
+
+@receiver(post_save, sender=Borrow)
+def count_borrow(sender, instance, created, **kwargs):
+    if created:
+        BookPopularity.record_borrow(instance.book_id)
+
+
+@receiver(post_save, sender=Borrow)
+@receiver(post_delete, sender=Borrow)
+@receiver(post_save, sender=Fine)
+@receiver(post_delete, sender=Fine)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+def refresh_stats(sender, instance, **kwargs):
+    invalidate_stats(instance.user_id)
+
+
+@receiver(post_save, sender=Borrow)
+@receiver(post_delete, sender=Borrow)
+def refresh_catalog_cache(sender, **kwargs):
+    # Copy counts change through queryset updates, which send no Book signals
+    invalidate_catalog()
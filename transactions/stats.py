@@ -0,0 +1,80 @@
+# transactions/stats.py
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from accounts.models import User
+from .models import Borrow, Fine, Reservation
+
+STATS_CACHE_TIMEOUT = 300  # seconds
+STATS_KINDS = ('borrows', 'reservations', 'fines')
+
+
+def _is_staff(user):
+    return user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]
+
+
+def _cache_key(kind, scope):
+    # The date is part of the key because overdue counts change at midnight
+    return f"transactions:stats:{kind}:{scope}:{timezone.now().date()}"
+
+
+def _scope(user):
+    # Staff see library-wide numbers, so they all share one cache entry
+    return 'staff' if _is_staff(user) else f'user:{user.pk}'
+
+
+def _cached(kind, user, compute):
+    key = _cache_key(kind, _scope(user))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute()
+        cache.set(key, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def borrow_stats(user):
+    """Stat tiles for the borrow list and return pages, in a single query"""
+    def compute():
+        queryset = Borrow.objects.all() if _is_staff(user) else Borrow.objects.filter(user=user)
+        return queryset.aggregate(
+            total_borrows_count=Count('id'),
+            active_borrows_count=Count('id', filter=Q(is_returned=False)),
+            overdue_borrows_count=Count('id', filter=Q(is_returned=False, due_date__lt=timezone.now().date())),
+            returned_borrows_count=Count('id', filter=Q(is_returned=True)),
+        )
+    return _cached('borrows', user, compute)
+
+
+def reservation_stats(user):
+    """Per-status reservation counts, in a single query"""
+    def compute():
+        queryset = Reservation.objects.all() if _is_staff(user) else Reservation.objects.filter(user=user)
+        return queryset.aggregate(
+            pending_count=Count('id', filter=Q(status='PENDING')),
+            available_count=Count('id', filter=Q(status='AVAILABLE')),
+            completed_count=Count('id', filter=Q(status='COMPLETED')),
+            cancelled_count=Count('id', filter=Q(status='CANCELLED')),
+        )
+    return _cached('reservations', user, compute)
+
+
+def fine_stats(user):
+    """Pending and paid fine totals, in a single query"""
+    def compute():
+        queryset = Fine.objects.all() if _is_staff(user) else Fine.objects.filter(user=user)
+        return queryset.aggregate(
+            total_pending_fines=Sum('amount', filter=Q(is_paid=False), default=0),
+            total_paid_fines=Sum('amount', filter=Q(is_paid=True), default=0),
+        )
+    return _cached('fines', user, compute)
+
+
+def invalidate_stats(user_id):
+    """Drop the cached stats a change to one of user_id's records can affect"""
+    cache.delete_many([
+        _cache_key(kind, scope)
+        for kind in STATS_KINDS
+        for scope in ('staff', f'user:{user_id}')
+    ])
@@ -1,3 +1,395 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from accounts.models import User
+from books.cache import catalog_generation
+from books.models import Book
+from notifications.models import Notification, OutgoingEmail
+from .fines import _assess_batch, assess_overdue_fines
+from .inventory import NoCopyAvailable
+from .models import Borrow, Fine, Report, Reservation
+from .reports import render_pending_reports, report_key, report_path
+
+
+def make_user(name, role=User.Role.STUDENT):
+    return User.objects.create_user(
+        username=name, email=f'{name}@example.com', university_id=name, role=role
+    )
+
+
+def due_date():
+    return timezone.now().date() + timedelta(days=14)
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Checkouts racing for the same book never lose or invent a copy"""
+
+    threads = 4
+    attempts = 10
+    copies = 15
+
+    def test_no_lost_copies(self):
+        book = Book.objects.create(title='Contended', author='A', isbn='C0001', total_copies=self.copies)
+        users = [make_user(f'racer{i}') for i in range(self.threads)]
+        borrowed = []
+        errors = []
+        barrier = threading.Barrier(self.threads)
+
+        def worker(user):
+            try:
+                thread_book = Book.objects.get(pk=book.pk)
+                barrier.wait()
+                for _ in range(self.attempts):
+                    try:
+                        Borrow.objects.create(user=user, book=thread_book, due_date=due_date())
+                        borrowed.append(user.pk)
+                    except (NoCopyAvailable, OperationalError):
+                        pass  # Sold out, or the database was locked: the checkout didn't happen
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        book.refresh_from_db()
+        borrows = Borrow.objects.filter(book=book).count()
+        self.assertEqual(borrows, len(borrowed))
+        self.assertGreaterEqual(book.available_copies, 0)
+        self.assertEqual(book.available_copies + borrows, self.copies)
+
+
+class ReturnBookTests(TestCase):
+    def setUp(self):
+        self.librarian = make_user('librarian', User.Role.LIBRARIAN)
+        self.student = make_user('student')
+        self.waiting = make_user('waiting')
+        self.book = Book.objects.create(title='Returned', author='A', isbn='R0001', total_copies=1)
+        self.borrow = Borrow.objects.create(user=self.student, book=self.book, due_date=due_date())
+
+    def test_return_book_frees_one_copy_once(self):
+        stale = Borrow.objects.get(pk=self.borrow.pk)
+        self.assertTrue(self.borrow.return_book())
+        self.assertFalse(self.borrow.return_book())
+        # A second return from a copy loaded before the first one doesn't free the copy again
+        self.assertFalse(stale.return_book())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 1)
+
+    def test_view_promotes_next_reservation(self):
+        reservation = Reservation.objects.create(user=self.waiting, book=self.book)
+        self.client.force_login(self.librarian)
+        self.client.post(reverse('return-book', kwargs={'pk': self.borrow.pk}))
+        reservation.refresh_from_db()
+        self.assertEqual(reservation.status, 'AVAILABLE')
+
+
+class CatalogGenerationTests(TestCase):
+    """Checking a copy out or back in changes the copy counts the catalog cache shows"""
+
+    def setUp(self):
+        self.student = make_user('student')
+        self.book = Book.objects.create(title='Counted', author='A', isbn='C0001', total_copies=2)
+
+    def assertBumps(self, change):
+        generation = catalog_generation()
+        change()
+        self.assertNotEqual(catalog_generation(), generation)
+
+    def test_checkout_return_and_delete(self):
+        borrows = []
+        self.assertBumps(lambda: borrows.append(
+            Borrow.objects.create(user=self.student, book=self.book, due_date=due_date())
+        ))
+        self.assertBumps(borrows[0].return_book)
+        self.assertBumps(borrows[0].delete)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked on SQLite')
+class QueryPlanTests(TestCase):
+    """The hot transaction queries are served by an index, in index order"""
+
+    def hot_queries(self):
+        today = timezone.now().date()
+        return {
+            'active borrows of a user': Borrow.objects.filter(user_id=0, is_returned=False),
+            'overdue borrows': Borrow.objects.filter(is_returned=False, due_date__lt=today).order_by('due_date'),
+            'active borrow of a book by a user': Borrow.objects.filter(book_id=0, user_id=0, is_returned=False),
+            'next pending reservation': Reservation.objects.filter(book_id=0, status='PENDING').order_by('reservation_date'),
+            'reservations of a user by status': Reservation.objects.filter(user_id=0, status='PENDING'),
+            'unread notifications': Notification.objects.filter(user_id=0, is_read=False).order_by('-created_at'),
+            'unpaid fines of a user': Fine.objects.filter(user_id=0, is_paid=False),
+        }
+
+    def test_hot_queries_use_an_index(self):
+        for name, queryset in self.hot_queries().items():
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+            with self.subTest(name, plan=plan):
+                # "SCAN table" without "USING ... INDEX" is a full table scan
+                self.assertFalse(any(step.startswith('SCAN') and 'INDEX' not in step for step in plan))
+                self.assertFalse(any('TEMP B-TREE' in step for step in plan))
+
+
+class ListQueryCountTests(TestCase):
+    """List pages cost the same number of queries however many rows they show"""
+
+    def setUp(self):
+        self.librarian = make_user('librarian', User.Role.LIBRARIAN)
+        self.students = [make_user(f'reader{i}') for i in range(10)]
+        self.client.force_login(self.librarian)
+
+    def add_rows(self, count):
+        for i in range(count):
+            book = Book.objects.create(title=f'Book {i}', author='A', isbn=f'L{i:04}', total_copies=2)
+            student = self.students[i % len(self.students)]
+            borrow = Borrow.objects.create(user=student, book=book, due_date=due_date())
+            Fine.objects.create(user=student, borrow=borrow, amount=5)
+            Reservation.objects.create(user=student, book=book)
+
+    def assertQueriesPerPage(self, name, expected_queries, page_sizes=(3, 10)):
+        for page_size in page_sizes:
+            with self.subTest(name, page_size=page_size), \
+                    mock.patch.object(resolve(reverse(name)).func.view_class, 'paginate_by', page_size):
+                cache.clear()  # The stat tiles are cached; count a cold page every time
+                with self.assertNumQueries(expected_queries):
+                    response = self.client.get(reverse(name))
+                self.assertEqual(len(response.context['object_list']), page_size)
+
+    def test_borrow_list(self):
+        self.add_rows(12)
+        self.assertQueriesPerPage('borrow-list', 4)
+
+    def test_fine_list(self):
+        self.add_rows(12)
+        self.assertQueriesPerPage('fine-list', 5)
+
+    def test_reservation_list(self):
+        # Not paginated: the page size is the number of reservations
+        for rows in (3, 10):
+            with self.subTest(rows=rows):
+                Book.objects.all().delete()
+                self.add_rows(rows)
+                cache.clear()
+                with self.assertNumQueries(4):
+                    response = self.client.get(reverse('reservation-list'))
+                self.assertEqual(len(response.context['reservations']), rows)
+
+
+class FineAssessmentTests(TestCase):
+    def setUp(self):
+        self.students = [make_user(f'late{i}') for i in range(3)]
+        overdue = timezone.now().date() - timedelta(days=3)
+        self.borrows = [
+            Borrow.objects.create(
+                user=student, due_date=overdue,
+                book=Book.objects.create(title=f'Late {i}', author='A', isbn=f'F{i:04}'),
+            )
+            for i, student in enumerate(self.students)
+        ]
+
+    def test_overdue_borrows_are_fined_and_notified(self):
+        self.assertEqual(assess_overdue_fines(), 3)
+        self.assertEqual(Fine.objects.count(), 3)
+        self.assertEqual(OutgoingEmail.objects.count(), 3)
+        self.assertEqual(assess_overdue_fines(), 0)
+
+    def test_fines_inserted_by_another_run_are_not_counted_or_notified(self):
+        # Fined by a concurrent run after this batch was selected
+        Fine.objects.create(user=self.students[0], borrow=self.borrows[0], amount=1)
+        borrows = list(Borrow.objects.select_related('user', 'book').filter(pk__in=[b.pk for b in self.borrows]))
+        self.assertEqual(_assess_batch(borrows, [], 'testserver'), 2)
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+        self.assertFalse(Notification.objects.filter(user=self.students[0]).exists())
+        self.assertEqual(Notification.objects.filter(user__in=self.students[1:]).count(), 2)
+
+
+class FakeHTML:
+    """Stands in for weasyprint.HTML, which needs native libraries"""
+    fail = False
+
+    def __init__(self, string, base_url=None):
+        self.string = string
+
+    def write_pdf(self, target):
+        if FakeHTML.fail:
+            raise RuntimeError('Renderer crashed')
+        with open(target, 'wb') as f:
+            f.write(b'%PDF-1.7 ' + self.string.encode())
+
+
+class ReportTests(TestCase):
+    def setUp(self):
+        reports_root = tempfile.TemporaryDirectory()
+        self.addCleanup(reports_root.cleanup)
+        override = override_settings(REPORTS_ROOT=reports_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        weasyprint = mock.patch.dict(sys.modules, {'weasyprint': mock.Mock(HTML=FakeHTML)})
+        weasyprint.start()
+        self.addCleanup(weasyprint.stop)
+        FakeHTML.fail = False
+
+        self.student = make_user('student')
+        self.other = make_user('other')
+        self.book = Book.objects.create(title='Statement', author='A', isbn='P0001', total_copies=3)
+        Borrow.objects.create(user=self.student, book=self.book, due_date=due_date())
+        self.params = {'user': self.student.pk}
+        self.client.force_login(self.student)
+
+    def request(self):
+        return self.client.get(reverse('report', args=['statement']))
+
+    def test_key_is_reused_until_the_data_changes(self):
+        key = report_key('statement', self.params)
+        self.assertEqual(report_key('statement', self.params), key)
+        self.assertNotEqual(report_key('statement', {'user': self.other.pk}), key)
+        Borrow.objects.create(user=self.student, book=self.book, due_date=due_date())
+        self.assertNotEqual(report_key('statement', self.params), key)
+
+    def test_request_queues_once_and_renders(self):
+        self.assertEqual(self.request().status_code, 200)
+        self.request()
+        report = Report.objects.get()
+        self.assertEqual(report.status, Report.Status.PENDING)
+
+        self.assertEqual(render_pending_reports(), (1, 0))
+        report.refresh_from_db()
+        self.assertEqual(report.status, Report.Status.DONE)
+        self.assertEqual(report.size, os.path.getsize(report_path('statement', report.key)))
+        self.assertRedirects(
+            self.request(), reverse('report-file', args=['statement', report.key]), fetch_redirect_response=False
+        )
+
+    def test_failed_report_is_queued_again_on_retry(self):
+        FakeHTML.fail = True
+        self.request()
+        self.assertEqual(render_pending_reports(), (0, 1))
+        report = Report.objects.get()
+        self.assertEqual(report.status, Report.Status.FAILED)
+        self.assertIn('Renderer crashed', report.error)
+
+        self.client.post(reverse('report', args=['statement']))
+        report.refresh_from_db()
+        self.assertEqual(report.status, Report.Status.PENDING)
+
+    def test_deleted_file_is_rendered_again(self):
+        self.request()
+        render_pending_reports()
+        report = Report.objects.get()
+        os.remove(report_path('statement', report.key))
+
+        response = self.request()
+        self.assertEqual(response.status_code, 200)
+        report.refresh_from_db()
+        self.assertEqual(report.status, Report.Status.PENDING)
+        self.assertEqual(render_pending_reports(), (1, 0))
+        self.assertTrue(os.path.exists(report_path('statement', report.key)))
+
+    def test_download(self):
+        self.request()
+        render_pending_reports()
+        report = Report.objects.get()
+        url = reverse('report-file', args=['statement', report.key])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.librarian = make_user('librarian', User.Role.LIBRARIAN)
+        self.student = make_user('student')
+        self.other = make_user('other')
+        self.book = Book.objects.create(title='Exported', author='A', isbn='X0001', total_copies=10)
+        self.other_book = Book.objects.create(title='Elsewhere', author='B', isbn='X0002', total_copies=10)
+        today = timezone.now().date()
+        self.old = Borrow.objects.create(user=self.student, book=self.book, due_date=due_date())
+        Borrow.objects.filter(pk=self.old.pk).update(issue_date=today - timedelta(days=40))
+        self.returned = Borrow.objects.create(user=self.student, book=self.other_book, due_date=due_date())
+        self.returned.return_book()
+        self.theirs = Borrow.objects.create(user=self.other, book=self.book, due_date=due_date())
+        Fine.objects.create(user=self.student, borrow=self.old, amount=5)
+        Fine.objects.create(user=self.other, borrow=self.theirs, amount=5, is_paid=True)
+        Reservation.objects.create(user=self.student, book=self.book)
+        Reservation.objects.create(user=self.other, book=self.book, status='CANCELLED')
+
+    def export(self, user, name, format='csv', **params):
+        self.client.force_login(user)
+        return self.client.get(reverse('transaction-export', args=[name, format]), params)
+
+    def rows(self, user, name, **params):
+        response = self.export(user, name, **params)
+        self.assertEqual(response.status_code, 200)
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.DictReader(io.StringIO(content)))
+
+    def ids(self, rows):
+        return sorted(int(row['id']) for row in rows)
+
+    def test_students_only_get_their_own_rows(self):
+        for name in ('borrows', 'fines', 'reservations'):
+            with self.subTest(name):
+                rows = self.rows(self.student, name)
+                self.assertTrue(rows)
+                self.assertEqual({row['user_id'] for row in rows}, {str(self.student.pk)})
+                # Filters can't widen the scope
+                rows = self.rows(self.student, name, search='other')
+                self.assertEqual({row['user_id'] for row in rows} - {str(self.student.pk)}, set())
+
+    def test_staff_get_every_row(self):
+        self.assertEqual(self.ids(self.rows(self.librarian, 'borrows')), [self.old.pk, self.returned.pk, self.theirs.pk])
+
+    def test_borrow_search_and_status(self):
+        self.assertEqual(self.ids(self.rows(self.librarian, 'borrows', search='Elsewhere')), [self.returned.pk])
+        self.assertEqual(self.ids(self.rows(self.librarian, 'borrows', status='returned')), [self.returned.pk])
+        self.assertEqual(
+            self.ids(self.rows(self.librarian, 'borrows', status='active', search='other@')), [self.theirs.pk]
+        )
+
+    def test_fine_and_reservation_status(self):
+        self.assertEqual([row['is_paid'] for row in self.rows(self.librarian, 'fines', status='paid')], ['True'])
+        self.assertEqual([row['status'] for row in self.rows(self.librarian, 'reservations', status='cancelled')],
+                         ['CANCELLED'])
+
+    def test_date_range(self):
+        today = timezone.now().date()
+        recent = self.rows(self.librarian, 'borrows', **{'from': (today - timedelta(days=7)).isoformat()})
+        self.assertEqual(self.ids(recent), [self.returned.pk, self.theirs.pk])
+        older = self.rows(self.librarian, 'borrows', to=(today - timedelta(days=7)).isoformat())
+        self.assertEqual(self.ids(older), [self.old.pk])
+        self.assertEqual(self.rows(self.librarian, 'fines', to=(today - timedelta(days=1)).isoformat()), [])
+
+    def test_bad_date_is_a_bad_request(self):
+        self.assertEqual(self.export(self.librarian, 'borrows', to='last week').status_code, 400)
+
+    def test_json_lines(self):
+        response = self.export(self.student, 'borrows', format='jsonl', status='returned')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.returned.pk])
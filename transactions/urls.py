@@ -4,7 +4,8 @@ from accounts import views
 from .views import (
     BorrowCreateView, BorrowListView, ReturnBookView,
     FineListView, PayFineView,
-    ReservationCreateView, ReservationListView
+    ReservationCreateView, ReservationListView, export,
+    ReportListView, report, report_file
 )
 
 urlpatterns = [
@@ -21,4 +22,12 @@ urlpatterns = [
     path('reservations/', ReservationListView.as_view(), name='reservation-list'),
     path('reservations/new/<int:pk>/', ReservationCreateView.as_view(), name='book-reserve'),
     path('reservations/cancel/<int:pk>/', ReservationCancelView.as_view(), name='reservation-cancel'),
+
+    # CSV / JSON Lines exports (borrows, fines, reservations)
+    path('<str:name>/export.<str:format>', export, name='transaction-export'),
+
+    # PDF reports, rendered by `manage.py render_reports`
+    path('reports/', ReportListView.as_view(), name='report-list'),
+    path('reports/<str:name>/', report, name='report'),
+    path('reports/<str:name>/<str:key>.pdf', report_file, name='report-file'),
 ]
\ No newline at end of file
@@ -1,19 +1,32 @@
 from django.shortcuts import get_object_or_404, redirect
-from django.views.generic import ListView, CreateView, UpdateView
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.views.generic import ListView, CreateView, UpdateView, TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.utils import timezone
 from datetime import timedelta
 from django.views.generic import View
-
-from django.db.models import Sum
-from .models import Borrow, Fine, Reservation
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import render
+from urllib.parse import urlencode
+import os
+
+from .models import Borrow, Fine, Reservation, Report
+from .stats import borrow_stats, fine_stats, reservation_stats
+from .inventory import NoCopyAvailable, promote_next_reservation
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, export_rows, stream_export
+from .reports import REPORTS, report_key, report_params, report_path, request_report
 from .forms import BorrowForm, ReturnForm, FinePaymentForm, ReservationForm
 from books.models import Book
 from accounts.models import User
+from UniLib.pagination import CursorPaginationMixin
 from django.urls import reverse
-from notifications.utils import notify  # adjust import to your project structure
+from notifications.utils import notify, notify_staff  # adjust import to your project structure
+from notifications.outbox import queue_email
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
@@ -62,7 +75,11 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
             return redirect('book-detail', pk=book.pk)
 
         form.instance.issued_by = user
-        response = super().form_valid(form)
+        try:
+            response = super().form_valid(form)
+        except NoCopyAvailable:
+            messages.error(self.request, f"'{book.title}' has no copies available right now.")
+            return redirect('book-detail', pk=book.pk)
 
         book_url = reverse('book-detail', kwargs={'pk': book.pk})
 
@@ -70,10 +87,7 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
         notify(borrower, f"You borrowed '{book.title}'", type='Borrowed Book', url=book_url)
 
         # Notify all staff (except the borrower if they are staff)
-        staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-        for staff in staff_users:
-            if staff != borrower:
-                notify(staff, f"{borrower.get_full_name()} borrowed '{book.title}'",  type='Borrowed Book', url=book_url)
+        notify_staff(f"{borrower.get_full_name()} borrowed '{book.title}'", type='Borrowed Book', url=book_url, exclude=borrower)
 
         # Email to borrower
         subject = f"You borrowed '{book.title}'"
@@ -85,7 +99,7 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
         })
         email = EmailMultiAlternatives(subject, '', to=[borrower.email])
         email.attach_alternative(html_content, "text/html")
-        email.send()
+        queue_email(email)
 
         messages.success(self.request, f"'{book.title}' borrowed successfully for {borrower.get_full_name()}!")
         return response
@@ -93,65 +107,29 @@ class BorrowCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy('book-detail', kwargs={'pk': self.kwargs['pk']})
 
-from django.db.models import Q
 
-class BorrowListView(LoginRequiredMixin, ListView):
+class BorrowListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Borrow
     template_name = 'transactions/borrow_list.html'
     context_object_name = 'borrows'
     paginate_by = 10
+    cursor_key = 'issue_date'
 
     def get_queryset(self):
         user = self.request.user
-        queryset = Borrow.objects.all().order_by('-issue_date')
-        search_query = self.request.GET.get('search', '').strip()
-        
-        if search_query:
-            queryset = queryset.filter(
-                Q(book__title__icontains=search_query) |
-                Q(book__author__icontains=search_query) |
-                Q(user__first_name__icontains=search_query) |
-                Q(user__last_name__icontains=search_query) |
-                Q(user__email__icontains=search_query) |
-                Q(user__university_id__icontains=search_query)
-            )
-        
-        # Apply status filter
-        status_filter = self.request.GET.get('status', '')
-        if status_filter == 'active':
-            queryset = queryset.filter(is_returned=False)
-        elif status_filter == 'overdue':
-            queryset = queryset.filter(is_returned=False, due_date__lt=timezone.now().date())
-        elif status_filter == 'returned':
-            queryset = queryset.filter(is_returned=True)
-        
+        queryset = Borrow.objects.select_related('book', 'user').order_by('-issue_date', '-pk').search(
+            self.request.GET.get('search', '').strip()
+        ).with_status(self.request.GET.get('status', ''))
+
         if user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]:
             return queryset
         return queryset.filter(user=user)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
-        
-        # Get base queryset for statistics (considering user role)
-        if user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]:
-            base_queryset = Borrow.objects.all()
-        else:
-            base_queryset = Borrow.objects.filter(user=user)
         
-        # Calculate statistics based on user role
-        total_borrows_count = base_queryset.count()
-        active_borrows_count = base_queryset.filter(is_returned=False).count()
-        overdue_borrows_count = base_queryset.filter(is_returned=False, due_date__lt=timezone.now().date()).count()
-        returned_borrows_count = base_queryset.filter(is_returned=True).count()
-        
-        # Add statistics to context
-        context.update({
-            'total_borrows_count': total_borrows_count,
-            'active_borrows_count': active_borrows_count,
-            'overdue_borrows_count': overdue_borrows_count,
-            'returned_borrows_count': returned_borrows_count,
-        })
+        # Statistics based on user role (one cached aggregate query)
+        context.update(borrow_stats(self.request.user))
         
         return context
 
@@ -176,33 +154,22 @@ class ReturnBookView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         fine_amount = borrow.fine.amount if fine_exists else 0
         fine_paid = borrow.fine.is_paid if fine_exists else True  # True if no fine
         
-
-        if user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]:
-            base_queryset = Borrow.objects.all()
-        else:
-            base_queryset = Borrow.objects.filter(user=user)
-        
-        total_borrows_count = base_queryset.count()
-        active_borrows_count = base_queryset.filter(is_returned=False).count()
-        overdue_borrows_count = base_queryset.filter(is_returned=False, due_date__lt=timezone.now().date()).count()
-        returned_borrows_count = base_queryset.filter(is_returned=True).count()
-        
         context.update({
             'fine_exists': fine_exists,
             'fine_amount': fine_amount,
             'fine_paid': fine_paid,
             'has_unpaid_fine': borrow.has_unpaid_fine,
-
-            'total_borrows_count': total_borrows_count,
-            'active_borrows_count': active_borrows_count,
-            'overdue_borrows_count': overdue_borrows_count,
-            'returned_borrows_count': returned_borrows_count,
         })
+        context.update(borrow_stats(user))
         return context
 
     def form_valid(self, form):
         borrow = form.save(commit=False)
-        borrow.return_book()
+        next_reservation = None
+        with transaction.atomic():
+            # Hand the returned copy's slot to the next reserver, if this return freed one
+            if borrow.return_book():
+                next_reservation = promote_next_reservation(borrow.book)
         response = super().form_valid(form)
 
         borrower = borrow.user
@@ -228,10 +195,7 @@ class ReturnBookView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         notify(borrower, f"You returned '{book.title}'", type='Returned Book', url=book_url)
 
         # Notify all staff
-        staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-        for staff in staff_users:
-            if staff != borrower:
-                notify(staff, f"{borrower.get_full_name()} returned '{book.title}'",  type='Returned Book', url=book_url)
+        notify_staff(f"{borrower.get_full_name()} returned '{book.title}'", type='Returned Book', url=book_url, exclude=borrower)
 
         # Email to borrower
         subject = f"You returned '{book.title}'"
@@ -242,15 +206,10 @@ class ReturnBookView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         })
         email = EmailMultiAlternatives(subject, '', to=[borrower.email])
         email.attach_alternative(html_content, "text/html")
-        email.send()
+        queue_email(email)
 
         # Notify next reserver
-        next_reservation = Reservation.objects.filter(book=book, status='PENDING').order_by('reservation_date').first()
         if next_reservation:
-            next_reservation.status = 'AVAILABLE'
-            next_reservation.notified_at = timezone.now()
-            next_reservation.save()
-
             notify(next_reservation.user,
                 f"Your reserved book '{book.title}' is now available",
                 type='RES',
@@ -265,59 +224,35 @@ class ReturnBookView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
             })
             email = EmailMultiAlternatives(subject, '', to=[next_reservation.user.email])
             email.attach_alternative(html_content, "text/html")
-            email.send()
+            queue_email(email)
 
         return response
 
     def get_success_url(self):
         return reverse_lazy('borrow-list')
-class FineListView(LoginRequiredMixin, ListView):
+class FineListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Fine
     template_name = 'transactions/fine_list.html'
     context_object_name = 'fines'
-    paginate_by = 10  # Add this line
+    paginate_by = 10
+    cursor_key = 'created_at'
     
     def get_queryset(self):
-        # Check for overdue books that need fines when someone visits the fine list
-        overdue_borrows = Borrow.objects.filter(
-            is_returned=False,
-            due_date__lt=timezone.now().date(),
-            overdue_notification_sent=False
-        )
-        
-        print(f"Found {overdue_borrows.count()} overdue borrows needing fines")
-        
-        for borrow in overdue_borrows:
-            # Pass the request to the method
-            fine_created = borrow.check_and_create_fine(self.request)
-            if fine_created:
-                borrow.overdue_notification_sent = True
-                borrow.save(update_fields=['overdue_notification_sent'])
-                print(f"✓ Created fine for {borrow}")
+        # Fines are created by the check_overdue_books job; this view only reads them.
+        fines = Fine.objects.select_related('user', 'borrow__book').order_by('-created_at', '-pk')
         
         # Return appropriate fines based on user role
         if hasattr(self.request.user, 'role'):
             if self.request.user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]:
-                return Fine.objects.all().order_by('-created_at')
+                return fines
         elif self.request.user.is_staff:
-            return Fine.objects.all().order_by('-created_at')
+            return fines
         
-        return Fine.objects.filter(user=self.request.user).order_by('-created_at')
+        return fines.filter(user=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        queryset = self.get_queryset()
-        
-        total_pending_fines = queryset.filter(is_paid=False).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        total_paid_fines = queryset.filter(is_paid=True).aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        context['total_pending_fines'] = total_pending_fines
-        context['total_paid_fines'] = total_paid_fines
+        context.update(fine_stats(self.request.user))
         
         if hasattr(self.request.user, 'role'):
             context['is_staff_user'] = self.request.user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]
@@ -371,7 +306,7 @@ class PayFineView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         try:
             email = EmailMultiAlternatives(subject, '', to=[user.email])
             email.attach_alternative(html_content, "text/html")
-            email.send()
+            queue_email(email)
         except Exception as e:
             # Log the error but don't break the payment process
             print(f"Failed to send payment confirmation email: {e}")
@@ -416,13 +351,10 @@ class ReservationCreateView(LoginRequiredMixin, CreateView):
             url=book_url)
 
         # ✅ Notify staff (excluding reserver)
-        staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-        for staff in staff_users:
-            if staff != reserver:
-                notify(staff,
-                    f"{reserver.get_full_name()} reserved '{book.title}'",
-                    type='RES',
-                    url=book_url)
+        notify_staff(f"{reserver.get_full_name()} reserved '{book.title}'",
+            type='RES',
+            url=book_url,
+            exclude=reserver)
         # Email to reserver
         subject = f"You reserved '{book.title}'"
         html_content = render_to_string('emails/reserved_book.html', {
@@ -432,7 +364,7 @@ class ReservationCreateView(LoginRequiredMixin, CreateView):
         })
         email = EmailMultiAlternatives(subject, '', to=[reserver.email])
         email.attach_alternative(html_content, "text/html")
-        email.send()
+        queue_email(email)
 
         messages.success(self.request, 'Book reserved successfully! You will be notified when available.')
         return response
@@ -452,19 +384,14 @@ class ReservationListView(LoginRequiredMixin, ListView):
     context_object_name = 'reservations'
     
     def get_queryset(self):
+        reservations = Reservation.objects.select_related('book', 'user').order_by('-reservation_date')
         if self.request.user.is_admin or self.request.user.is_librarian:
-            return Reservation.objects.all().order_by('-reservation_date')
-        return self.request.user.reservations.all().order_by('-reservation_date')
+            return reservations
+        return reservations.filter(user=self.request.user)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        reservations = self.get_queryset()
-        
-        context['pending_count'] = reservations.filter(status='PENDING').count()
-        context['available_count'] = reservations.filter(status='AVAILABLE').count()
-        context['completed_count'] = reservations.filter(status='COMPLETED').count()
-        context['cancelled_count'] = reservations.filter(status='CANCELLED').count()
-        
+        context.update(reservation_stats(self.request.user))
         return context
 class ReservationCancelView(LoginRequiredMixin, View):
     def post(self, request, pk):
@@ -495,13 +422,10 @@ class ReservationCancelView(LoginRequiredMixin, View):
             url=reservation_url)
         
         # Notify staff (excluding the user who cancelled if they're staff)
-        staff_users = User.objects.filter(role__in=[User.Role.ADMIN, User.Role.LIBRARIAN])
-        for staff in staff_users:
-            if staff != request.user:
-                notify(staff,
-                    f"Reservation for '{reservation.book.title}' by {reservation.user.get_full_name()} was cancelled.",
-                    type='RES_CANCEL',
-                    url=reservation_url)
+        notify_staff(f"Reservation for '{reservation.book.title}' by {reservation.user.get_full_name()} was cancelled.",
+            type='RES_CANCEL',
+            url=reservation_url,
+            exclude=request.user)
         
         # Send email notification to the user
         subject = f"Reservation Cancelled: {reservation.book.title}"
@@ -517,10 +441,99 @@ class ReservationCancelView(LoginRequiredMixin, View):
         try:
             email = EmailMultiAlternatives(subject, '', to=[reservation.user.email])
             email.attach_alternative(html_content, "text/html")
-            email.send()
+            queue_email(email)
         except Exception as e:
             # Log email error but don't break the flow
             print(f"Email sending failed: {e}")
         
         messages.success(request, 'Reservation cancelled successfully.')
-        return redirect('reservation-list')
\ No newline at end of file
+        return redirect('reservation-list')
+
+@login_required
+def export(request, name, format):
+    """Stream borrows/fines/reservations as CSV or JSON Lines, see transactions/exports.py"""
+    if name not in EXPORTS or format not in EXPORT_FORMATS:
+        raise Http404
+    try:
+        header, rows = export_rows(name, request.GET, request.user)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    response = StreamingHttpResponse(stream_export(header, rows, format), content_type=EXPORT_FORMATS[format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="unilib-{name}-{timezone.now():%Y%m%d}.{format}"'
+    )
+    return response
+
+
+def _report_url(report):
+    return f"{reverse('report', args=[report.name])}?{urlencode(report.params)}"
+
+
+class ReportListView(LoginRequiredMixin, TemplateView):
+    """Report forms and the latest reports; students and faculty only get their statement"""
+    template_name = 'transactions/reports.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        user = self.request.user
+        is_staff = user.role in [User.Role.ADMIN, User.Role.LIBRARIAN]
+        reports = Report.objects.order_by('-created_at')
+        if not is_staff:
+            reports = reports.filter(name='statement', params__user=user.pk)
+        reports = list(reports[:20])
+        for report in reports:
+            report.title = REPORTS[report.name].title
+            report.url = _report_url(report)
+        context.update({
+            'is_staff': is_staff,
+            'reports': reports,
+            'this_month': f'{timezone.localdate():%Y-%m}',
+        })
+        return context
+
+
+@login_required
+def report(request, name):
+    """
+    Send report name for the current data: a redirect to the PDF when it has
+    been rendered, otherwise queue it and show a page that waits for it.
+    """
+    if name not in REPORTS:
+        raise Http404
+    try:
+        params = report_params(name, request.GET, request.user)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    key = report_key(name, params)
+    if os.path.exists(report_path(name, key)):
+        return redirect('report-file', name=name, key=key)
+
+    job = request_report(name, params, key, request.user)
+    if request.method == 'POST' and job.status == Report.Status.FAILED:
+        Report.objects.filter(pk=job.pk, status=Report.Status.FAILED).update(status=Report.Status.PENDING, error='')
+        return redirect(request.get_full_path())
+    job.title = REPORTS[name].title
+    return render(request, 'transactions/report_status.html', {'report': job})
+
+
+@login_required
+def report_file(request, name, key):
+    """A rendered report, by key. The content never changes, so browsers keep it."""
+    report = get_object_or_404(Report, name=name, key=key)
+    user = request.user
+    if user.role not in [User.Role.ADMIN, User.Role.LIBRARIAN] and not (
+        name == 'statement' and report.params.get('user') == user.pk
+    ):
+        raise PermissionDenied
+    path = report_path(name, key)
+    if not os.path.exists(path):
+        raise Http404
+
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        filename = '-'.join(['unilib', name, *map(str, report.params.values())])
+        response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename=f'{filename}.pdf')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response